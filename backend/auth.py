@@ -1,11 +1,22 @@
 """
 Authentication & Authorization module.
 Handles JWT tokens, password hashing, and user management.
+
+Never compare secret-derived strings with ``==`` in this module — use
+``secure_compare`` (enforced by tests/backend/test_auth.py).
 """
+import functools
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import anyio
+import jwt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -16,20 +27,111 @@ from backend.models import User
 SECRET_KEY = "campus-store-secret-key-change-in-production-2024"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
+TOKEN_CACHE_TTL_SECONDS = 30  # bounds how long a verified token skips jwt.decode
+USER_CACHE_TTL_SECONDS = 60  # bounds how long a role/status change takes to apply
 
 # ─── Password Hashing ───
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# New hashes are Argon2; legacy bcrypt hashes still verify and are
+# upgraded on the next successful login (see verify_and_update_password).
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "2"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "19456"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+
+
+# Fixed jwt.decode arguments, built once instead of per request
+_DECODE_KW = {
+    "key": SECRET_KEY,
+    "algorithms": [ALGORITHM],
+    "options": {"verify_aud": False, "verify_iss": False},
+}
+
+# ─── Decoded Token Cache ───
+# Keyed by a digest of the raw token so the cache never holds bearer secrets.
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+# ─── Current User Cache ───
+# Lightweight, session-independent snapshot of the columns auth checks need.
+# Routes that need to mutate the user should load it with db.get(User, user.id).
+CurrentUser = namedtuple("CurrentUser", ["id", "username", "role", "is_active", "full_name"])
+
+_user_cache = TTLCache(maxsize=5000, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
 
 # ─── Bearer Token Scheme ───
 security = HTTPBearer(auto_error=False)
 
 
+def secure_compare(a: str, b: str) -> bool:
+    """Constant-time string comparison, so timing doesn't leak how much of a value matched."""
+    return hmac.compare_digest(a.encode(), b.encode())
+
+
+# The hashing backends are imported and built on first use rather than at import
+# time, keeping them off the serverless cold-start path (token-only requests
+# never need them).
+
+@functools.lru_cache(maxsize=1)
+def _password_hasher():
+    from argon2 import PasswordHasher
+    return PasswordHasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST,
+        parallelism=ARGON2_PARALLELISM,
+    )
+
+
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    return hashed_password.startswith(("$2a$", "$2b$", "$2y$"))
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    from argon2.exceptions import InvalidHashError, VerificationError
+    if _is_bcrypt_hash(hashed_password):
+        import bcrypt
+        try:
+            # bcrypt only looks at the first 72 bytes
+            return bcrypt.checkpw(plain_password.encode()[:72], hashed_password.encode())
+        except ValueError:
+            return False
+    try:
+        return _password_hasher().verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """Verify a password and return (valid, new_hash); new_hash is set when the stored hash is outdated."""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if _is_bcrypt_hash(hashed_password) or _password_hasher().check_needs_rehash(hashed_password):
+        return True, hash_password(plain_password)
+    return True, None
 
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _password_hasher().hash(password)
+
+
+# Async variants for use from ``async def`` code paths: hashing is CPU-bound,
+# so run it in the worker thread pool instead of on the event loop.
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await anyio.to_thread.run_sync(verify_password, plain_password, hashed_password)
+
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    return await anyio.to_thread.run_sync(verify_and_update_password, plain_password, hashed_password)
+
+
+async def ahash_password(password: str) -> str:
+    return await anyio.to_thread.run_sync(hash_password, password)
+
+
+def invalidate_user_cache(username: str):
+    """Drop a cached user snapshot — call after changing a user's role, password or status."""
+    with _user_cache_lock:
+        _user_cache.pop(username, None)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -40,11 +142,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 
 def decode_token(token: str) -> dict:
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    key = hashlib.sha256(token.encode()).hexdigest()[:32]
+    with _token_cache_lock:
+        payload = _token_cache.get(key)
+    # Re-verify once the token itself has expired, even if the cache entry hasn't
+    if payload is not None and payload.get("exp", 0) > time.time():
         return payload
-    except JWTError:
+
+    try:
+        payload = jwt.decode(token, **_DECODE_KW)
+    except jwt.PyJWTError:
         return None
+    with _token_cache_lock:
+        _token_cache[key] = payload
+    return payload
 
 
 # ─── Dependencies ───
@@ -52,7 +163,7 @@ def decode_token(token: str) -> dict:
 def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db),
-) -> User:
+) -> CurrentUser:
     """Extract and validate the current user from the JWT token."""
     if credentials is None:
         raise HTTPException(
@@ -73,16 +184,34 @@ def get_current_user(
     if username is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    user = db.query(User).filter(User.username == username).first()
+    uid = payload.get("uid")
+    with _user_cache_lock:
+        user = _user_cache.get(username)
+    if user is not None and uid is not None and user.id != uid:
+        # Cached entry is a different account under the same username (e.g. deleted and
+        # re-created): treat it as a miss so the uid/username check below decides
+        user = None
+    if user is None:
+        # Load only the columns auth needs — never hydrate hashed_password per request
+        criteria = [User.username == username]
+        if uid is not None:
+            # Primary-key lookup; username still has to match the token subject
+            criteria.insert(0, User.id == uid)
+        row = db.query(*(getattr(User, f) for f in CurrentUser._fields)).filter(*criteria).first()
+        if row is not None:
+            user = CurrentUser(*row)
+            with _user_cache_lock:
+                _user_cache[username] = user
+
     if user is None or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found or inactive")
 
     return user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+def require_admin(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     """Require admin role for the endpoint."""
-    if current_user.role != "admin":
+    if not secure_compare(current_user.role or "", "admin"):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin access required"
@@ -91,22 +220,49 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
 
 
 # ─── Seed Default Users ───
+# Pre-computed hashes of the dev default passwords ("admin123" / "staff123"),
+# so cold starts don't pay the hashing cost. Set ADMIN_PASSWORD / STAFF_PASSWORD
+# to seed real credentials instead.
+ADMIN_DEFAULT_HASH = "$argon2id$v=19$m=19456,t=2,p=1$O0cIYew9p5Qy5jxHqNVaCw$enFhDt2ZzHqZGY2jC4gdn9yXQ0r50MCLpzRHwasPcEA"
+STAFF_DEFAULT_HASH = "$argon2id$v=19$m=19456,t=2,p=1$TmkNAQCAMGaslfLeuxcipA$8dvbIIPptvzgEamC9p+s53UbZ0FUUXMzd5Oy3nxM/xA"
+
+# Set once this process has confirmed the default users exist; warm starts skip the query.
+_seeded = False
+
 
 def seed_default_users(db: Session):
     """Create default admin and staff users if they don't exist."""
+    global _seeded
+    if _seeded:
+        return
+
     defaults = [
-        {"username": "admin", "password": "admin123", "full_name": "Store Administrator", "role": "admin"},
-        {"username": "staff", "password": "staff123", "full_name": "Store Staff", "role": "staff"},
+        {"username": "admin", "password_env": "ADMIN_PASSWORD", "default_hash": ADMIN_DEFAULT_HASH,
+         "full_name": "Store Administrator", "role": "admin"},
+        {"username": "staff", "password_env": "STAFF_PASSWORD", "default_hash": STAFF_DEFAULT_HASH,
+         "full_name": "Store Staff", "role": "staff"},
     ]
+    existing = {
+        username for (username,) in
+        db.query(User.username).filter(User.username.in_([d["username"] for d in defaults]))
+    }
+    if len(existing) >= len(defaults):
+        _seeded = True
+        return
+
+    new_users = []
     for user_data in defaults:
-        existing = db.query(User).filter(User.username == user_data["username"]).first()
-        if not existing:
-            new_user = User(
-                username=user_data["username"],
-                hashed_password=hash_password(user_data["password"]),
-                full_name=user_data["full_name"],
-                role=user_data["role"],
-            )
-            db.add(new_user)
-            print(f"  ✅ Created user: {user_data['username']} ({user_data['role']})")
+        if user_data["username"] in existing:
+            continue
+        password = os.getenv(user_data["password_env"])
+        new_users.append(User(
+            username=user_data["username"],
+            hashed_password=hash_password(password) if password else user_data["default_hash"],
+            full_name=user_data["full_name"],
+            role=user_data["role"],
+        ))
+        print(f"  ✅ Created user: {user_data['username']} ({user_data['role']})")
+
+    db.add_all(new_users)
     db.commit()
+    _seeded = True
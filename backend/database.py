@@ -2,9 +2,10 @@
 Database configuration and session management.
 Uses SQLite for development, easily swappable to PostgreSQL for production.
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 import os
 
 
@@ -21,12 +22,48 @@ if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
 
 connect_args = {"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
 
+engine_kwargs = {}
+if "postgresql" in DATABASE_URL and os.getenv("VERCEL"):
+    # Serverless: many short-lived instances would each hold idle connections.
+    # Open per checkout and let the Supabase/PgBouncer pooler do the pooling.
+    engine_kwargs["poolclass"] = NullPool
+elif DATABASE_URL in ("sqlite://", "sqlite:///:memory:"):
+    # Each new connection to an in-memory URL is a fresh, empty database: hand every
+    # checkout the one connection instead.
+    engine_kwargs["poolclass"] = StaticPool
+elif "postgresql" in DATABASE_URL:
+    # LIFO checkout keeps a small set of warm connections busy (better PG cache
+    # locality, lets idle extras time out); pre-ping + recycle avoid handing out
+    # connections the server or pooler has already dropped.
+    engine_kwargs.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        pool_use_lifo=True,
+    )
+
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
-    echo=False
+    echo=False,
+    **engine_kwargs,
 )
 
+if "sqlite" in DATABASE_URL:
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _connection_record):
+        """WAL + relaxed fsync: much faster writes and concurrent readers during writes."""
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.execute("PRAGMA cache_size=-65536")    # 64 MiB
+        cursor.close()
+
+# engine / SessionLocal are module globals so warm serverless invocations reuse them.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -40,7 +77,22 @@ def get_db():
         db.close()
 
 
+_schema_ready = False
+
+
 def init_db():
-    """Create all tables."""
-    from backend.models import Product, Batch, Transaction  # noqa: F401
+    """Create all tables (skipped once the schema is known to exist)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    # One catalog query instead of create_all's per-table existence checks
+    if set(Base.metadata.tables) <= set(inspect(engine).get_table_names()):
+        _schema_ready = True
+        return
     Base.metadata.create_all(bind=engine)
+    _schema_ready = True
+
+
+# Register every model on Base.metadata exactly once. Kept at the bottom because
+# backend.models imports Base from this module.
+import backend.models  # noqa: E402, F401
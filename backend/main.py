@@ -2,16 +2,22 @@
 Smart Campus Store Inventory & Expiry Tracker — FastAPI Backend
 Full REST API covering products, batches, transactions, analytics, and ML predictions.
 """
-from fastapi import FastAPI, Depends, HTTPException, Query
+from contextlib import asynccontextmanager
+from fastapi import BackgroundTasks, FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, and_, case, literal
+from fastapi.responses import FileResponse, ORJSONResponse
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload, undefer
+from sqlalchemy import Date, cast, func, desc, and_, or_, case, literal, select, update
 from datetime import date, datetime, timedelta
 from typing import List, Optional
 from pydantic import BaseModel
+import asyncio
 import os
+import threading
+import anyio
+import numpy as np
+from cachetools import TTLCache
 
 from backend.database import get_db, init_db
 from backend.models import Product, Batch, Transaction, User
@@ -19,46 +25,34 @@ from backend.schemas import (
     ProductCreate, ProductUpdate, ProductResponse,
     BatchCreate, BatchInfo,
     TransactionCreate, TransactionResponse,
-    ExpiryAlert, StockAlert, DashboardStats,
-    CategorySales, RevenueData, SeasonalPattern,
+    ExpiryAlert, DashboardStats,
+    RevenueData, SeasonalPattern,
     SupplierCreate, SupplierResponse, PurchaseOrderResponse,
 )
 from backend.models import Product, Batch, Transaction, Supplier, PurchaseOrder
-from backend.ml_engine import seasonal_analyzer
+from backend.ml_engine import MONTH_NAMES, seasonal_analyzer
 from backend.auth import (
-    verify_password, hash_password, create_access_token,
+    verify_and_update_password, hash_password, create_access_token,
     get_current_user, require_admin, seed_default_users,
+    invalidate_user_cache, CurrentUser,
 )
 
-app = FastAPI(
-    title="Smart Campus Store API",
-    description="Inventory & Expiry Tracker for campus stores",
-    version="1.0.0",
-)
+# ──── Startup ────
+# Sync endpoints run in anyio's worker-thread pool (default 40 threads).
+THREADPOOL_TOKENS = int(os.getenv("THREADPOOL_TOKENS", "40"))
+# "0" trains the ML engine before serving instead of in the background (tests use
+# this so nothing reads the global analyzer while training is still writing it).
+ML_BACKGROUND_TRAINING = os.getenv("ML_BACKGROUND_TRAINING", "1") != "0"
 
-# CORS — allow frontend
+_CSV_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "medium_sales_dataset.csv")
 
-# CORS — allow frontend
-origins = os.getenv("CORS_ORIGINS", "*").split(",")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def _train_ml_engine(csv_path: str):
+    seasonal_analyzer.train_from_csv(csv_path)
+    print("✅ ML engine trained from CSV")
 
 
-# ──── Startup ────
-@app.on_event("startup")
-def startup():
-    init_db()
-    # Train ML engine from CSV if available
-    csv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "medium_sales_dataset.csv")
-    if os.path.exists(csv_path):
-        seasonal_analyzer.train_from_csv(csv_path)
-        print("✅ ML engine trained from CSV")
+def _seed_startup_data():
     # Try seeding database
     try:
         from backend.seed import seed_database
@@ -95,6 +89,47 @@ def startup():
         print(f"User seed note: {e}")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+    init_db()
+    await anyio.to_thread.run_sync(_seed_startup_data)
+
+    # Train ML engine from CSV in the background so the worker starts serving
+    # immediately; predictions fall back to heuristics until it finishes.
+    training = None
+    if os.path.exists(_CSV_PATH) and not seasonal_analyzer.is_trained:
+        training = asyncio.create_task(anyio.to_thread.run_sync(_train_ml_engine, _CSV_PATH))
+        if not ML_BACKGROUND_TRAINING:
+            await training
+    yield
+    if training is not None:
+        await training
+
+
+app = FastAPI(
+    title="Smart Campus Store API",
+    description="Inventory & Expiry Tracker for campus stores",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# CORS — allow frontend
+
+# CORS — allow frontend
+origins = os.getenv("CORS_ORIGINS", "*").split(",")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+
+
 # ──── Serve Frontend ────
 _base = os.path.dirname(os.path.dirname(__file__))
 _dist_dir = os.path.join(_base, "frontend", "dist")
@@ -135,12 +170,19 @@ class UserCreate(BaseModel):
 def login(req: LoginRequest, db: Session = Depends(get_db)):
     """Authenticate user and return JWT token."""
     user = db.query(User).filter(User.username == req.username).first()
-    if not user or not verify_password(req.password, user.hashed_password):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    valid, new_hash = verify_and_update_password(req.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid username or password")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account is disabled")
+    if new_hash:
+        # Transparently upgrade legacy/weaker hashes to the current policy
+        user.hashed_password = new_hash
+        db.commit()
 
-    token = create_access_token(data={"sub": user.username, "role": user.role})
+    token = create_access_token(data={"sub": user.username, "role": user.role, "uid": user.id})
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -154,7 +196,7 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 
 
 @app.get("/api/auth/me")
-def get_me(current_user: User = Depends(get_current_user)):
+def get_me(current_user: CurrentUser = Depends(get_current_user)):
     """Return current authenticated user info."""
     return {
         "id": current_user.id,
@@ -165,7 +207,7 @@ def get_me(current_user: User = Depends(get_current_user)):
 
 
 @app.get("/api/auth/users")
-def list_users(db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def list_users(db: Session = Depends(get_db), admin: CurrentUser = Depends(require_admin)):
     """List all users (admin only)."""
     users = db.query(User).all()
     return [
@@ -181,7 +223,7 @@ def list_users(db: Session = Depends(get_db), admin: User = Depends(require_admi
 
 
 @app.post("/api/auth/users")
-def create_user(req: UserCreate, db: Session = Depends(get_db), admin: User = Depends(require_admin)):
+def create_user(req: UserCreate, db: Session = Depends(get_db), admin: CurrentUser = Depends(require_admin)):
     """Create a new user (admin only)."""
     existing = db.query(User).filter(User.username == req.username).first()
     if existing:
@@ -197,6 +239,7 @@ def create_user(req: UserCreate, db: Session = Depends(get_db), admin: User = De
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_user_cache(new_user.username)
     return {"id": new_user.id, "username": new_user.username, "role": new_user.role}
 
 
@@ -204,6 +247,54 @@ def create_user(req: UserCreate, db: Session = Depends(get_db), admin: User = De
 # PRODUCTS
 # ═══════════════════════════════════════════════════
 
+# Distinct product categories, cached; product writes bump the version.
+CATEGORIES_CACHE_TTL_SECONDS = 60
+_categories_cache = TTLCache(maxsize=4, ttl=CATEGORIES_CACHE_TTL_SECONDS)
+_categories_cache_lock = threading.Lock()
+_categories_version = 0
+
+
+def invalidate_categories_cache():
+    global _categories_version
+    with _categories_cache_lock:
+        _categories_version += 1
+
+
+def _product_categories(db: Session) -> List[str]:
+    # TTLCache.get can evict expired entries, so reads take the lock too
+    with _categories_cache_lock:
+        version = _categories_version
+        cached = _categories_cache.get(version)
+    if cached is not None:
+        return cached
+    categories = [c for (c,) in db.query(Product.category).distinct()]
+    with _categories_cache_lock:
+        _categories_cache[version] = categories
+    return categories
+
+
+_PRODUCT_FIELDS = tuple(f for f in ProductResponse.model_fields if f != "batches")
+
+
+def _product_payload(product: Product, today: date) -> dict:
+    """ProductResponse fields, with batch expiry status/days computed against one `today`."""
+    payload = {f: getattr(product, f) for f in _PRODUCT_FIELDS}
+    payload["batches"] = [
+        {
+            "id": b.id,
+            "batch_number": b.batch_number,
+            "quantity": b.quantity,
+            "cost_price": b.cost_price,
+            "expiry_date": b.expiry_date,
+            "manufacture_date": b.manufacture_date,
+            "expiry_status": Batch.status_for(b.expiry_date, today),
+            "days_until_expiry": Batch.days_for(b.expiry_date, today),
+        }
+        for b in product.batches
+    ]
+    return payload
+
+
 @app.get("/api/products", response_model=List[ProductResponse])
 def list_products(
     category: Optional[str] = None,
@@ -212,7 +303,9 @@ def list_products(
     db: Session = Depends(get_db)
 ):
     """List all products with optional filters."""
-    query = db.query(Product).options(joinedload(Product.batches))
+    query = db.query(Product).options(
+        selectinload(Product.batches), undefer(Product.total_stock), raiseload("*")
+    )
 
     if category:
         query = query.filter(Product.category == category)
@@ -223,22 +316,21 @@ def list_products(
             (Product.barcode.ilike(f"%{search}%"))
         )
 
-    products = query.order_by(Product.name).all()
-
     if low_stock:
-        products = [p for p in products if p.total_stock < p.min_stock]
+        query = query.filter(Product.total_stock < Product.min_stock)
 
-    return products
+    today = date.today()
+    return [_product_payload(p, today) for p in query.order_by(Product.name)]
 
 
 @app.get("/api/products/{product_id}", response_model=ProductResponse)
 def get_product(product_id: int, db: Session = Depends(get_db)):
     product = db.query(Product).options(
-        joinedload(Product.batches)
+        selectinload(Product.batches), undefer(Product.total_stock)
     ).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return product
+    return _product_payload(product, date.today())
 
 
 @app.post("/api/products", response_model=ProductResponse)
@@ -249,6 +341,8 @@ def create_product(data: ProductCreate, db: Session = Depends(get_db)):
     product = Product(**data.model_dump())
     db.add(product)
     db.commit()
+    invalidate_dashboard_cache()
+    invalidate_categories_cache()
     db.refresh(product)
     return product
 
@@ -261,6 +355,8 @@ def update_product(product_id: int, data: ProductUpdate, db: Session = Depends(g
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(product, field, value)
     db.commit()
+    invalidate_dashboard_cache()
+    invalidate_categories_cache()
     db.refresh(product)
     return product
 
@@ -272,6 +368,8 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Product not found")
     db.delete(product)
     db.commit()
+    invalidate_dashboard_cache()
+    invalidate_categories_cache()
     return {"message": "Product deleted"}
 
 
@@ -279,11 +377,11 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
 def get_by_barcode(barcode: str, db: Session = Depends(get_db)):
     """Look up product by barcode (for scanner)."""
     product = db.query(Product).options(
-        joinedload(Product.batches)
+        selectinload(Product.batches), undefer(Product.total_stock)
     ).filter(Product.barcode == barcode).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found for barcode")
-    return product
+    return _product_payload(product, date.today())
 
 
 @app.get("/api/products/{product_id}/pulse")
@@ -292,26 +390,29 @@ def get_pulse_discount(product_id: int, db: Session = Depends(get_db)):
     Pulse Engine: Check if a product has near-expiry batches.
     If any batch expires within 7 days → 20% automatic discount.
     """
-    from datetime import date as dt_date
-    product = db.query(Product).options(
-        joinedload(Product.batches)
-    ).filter(Product.id == product_id).first()
+    product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    today = dt_date.today()
-    near_expiry_batches = []
-    for b in product.batches:
-        if b.quantity > 0:
-            days_left = (b.expiry_date - today).days
-            if 0 < days_left < 7:
-                near_expiry_batches.append({
-                    "batch_id": b.id,
-                    "batch_number": b.batch_number,
-                    "days_left": days_left,
-                    "quantity": b.quantity,
-                    "expiry_date": str(b.expiry_date),
-                })
+    # 0 < days_left < 7, as date bounds so the filter runs in SQL
+    today = date.today()
+    pulse_cutoff = today + timedelta(days=7)
+    batches = db.query(Batch.id, Batch.batch_number, Batch.expiry_date, Batch.quantity).filter(
+        Batch.product_id == product_id,
+        Batch.quantity > 0,
+        Batch.expiry_date > today,
+        Batch.expiry_date < pulse_cutoff,
+    ).order_by(Batch.expiry_date, Batch.id).all()
+    near_expiry_batches = [
+        {
+            "batch_id": b.id,
+            "batch_number": b.batch_number,
+            "days_left": (b.expiry_date - today).days,
+            "quantity": b.quantity,
+            "expiry_date": str(b.expiry_date),
+        }
+        for b in batches
+    ]
 
     has_discount = len(near_expiry_batches) > 0
     discount_pct = 20 if has_discount else 0
@@ -363,121 +464,112 @@ def create_batch(data: BatchCreate, db: Session = Depends(get_db)):
     )
     db.add(tx)
     db.commit()
+    invalidate_dashboard_cache()
     db.refresh(batch)
     return batch
 
 
+def _expiry_status(today: date):
+    """Status bucket as a SQL CASE, using bound date cutoffs (portable across dialects)."""
+    return case(
+        (Batch.expiry_date <= today, "expired"),
+        (Batch.expiry_date < today + timedelta(days=7), "critical"),
+        (Batch.expiry_date <= today + timedelta(days=15), "warning"),
+        else_="good",
+    )
+
+
+def _expiry_rows(db: Session, today: date, *criteria):
+    """Flat (batch, product, status) rows for in-stock batches, soonest expiry first (ties by id)."""
+    return db.query(
+        Product.id.label("product_id"),
+        Product.name.label("product_name"),
+        Product.item_id,
+        Batch.id.label("batch_id"),
+        Batch.batch_number,
+        Batch.expiry_date,
+        Batch.quantity,
+        _expiry_status(today).label("status"),
+    ).join(Product, Batch.product_id == Product.id).filter(
+        Batch.quantity > 0, *criteria
+    ).order_by(Batch.expiry_date, Batch.id)
+
+
+def _alert_dicts(rows, today: date) -> List[dict]:
+    """ExpiryAlert-shaped dicts from _expiry_rows rows (no per-row model validation)."""
+    return [{**r._mapping, "days_left": (r.expiry_date - today).days} for r in rows]
+
+
+def _expiry_alerts(db: Session, days: int) -> List[dict]:
+    """Alerts for in-stock batches expiring within `days` days, soonest first."""
+    today = date.today()
+    rows = _expiry_rows(db, today, Batch.expiry_date <= today + timedelta(days=days))
+    return _alert_dicts(rows, today)
+
+
 @app.get("/api/batches/expiring", response_model=List[ExpiryAlert])
-def get_expiring_batches(days: int = 365, db: Session = Depends(get_db)):
-    """Get list of batches expiring within N days."""
-    cutoff = date.today() + timedelta(days=days)
-    batches = db.query(Batch).options(
-        joinedload(Batch.product)
-    ).filter(
-        Batch.expiry_date <= cutoff,
-        Batch.quantity > 0
-    ).order_by(Batch.expiry_date).all()
-    
-    alerts = []
+def get_expiring_batches(
+    days: int = Query(default=365, ge=0, le=3650),
+    limit: int = Query(default=5000, ge=1, le=5000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get list of batches expiring within N days, soonest first.
+    Keyset-paginated: when more rows remain, the X-Next-Cursor response
+    header holds the cursor ("expiry_date|batch_id") for the next page.
+    """
     today = date.today()
-    
-    for b in batches:
-        days_left = (b.expiry_date - today).days
-        if days_left <= 0:
-            status = "expired"
-        elif days_left < 7:
-            status = "critical"
-        elif days_left <= 15:
-            status = "warning"
-        else:
-            status = "good"
-            
-        alerts.append(ExpiryAlert(
-            product_id=b.product.id,
-            product_name=b.product.name,
-            item_id=b.product.item_id,
-            batch_id=b.id,
-            batch_number=b.batch_number,
-            expiry_date=b.expiry_date,
-            days_left=days_left,
-            quantity=b.quantity,
-            status=status,
+    criteria = [Batch.expiry_date <= today + timedelta(days=days)]
+    if cursor:
+        try:
+            cursor_date, cursor_id = cursor.split("|")
+            cursor_date, cursor_id = date.fromisoformat(cursor_date), int(cursor_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        criteria.append(or_(
+            Batch.expiry_date > cursor_date,
+            and_(Batch.expiry_date == cursor_date, Batch.id > cursor_id),
         ))
-    return alerts
+
+    rows = _expiry_rows(db, today, *criteria).limit(limit + 1).all()
+    page = rows[:limit]
+
+    # High-volume endpoint: plain dicts straight to orjson, no per-row model validation
+    response = ORJSONResponse(_alert_dicts(page, today))
+    if len(rows) > limit:
+        last = page[-1]
+        response.headers["X-Next-Cursor"] = f"{last.expiry_date.isoformat()}|{last.batch_id}"
+    return response
 
 
 @app.get("/api/cron/daily-check")
 def daily_cron_check(db: Session = Depends(get_db)):
     """Daily Cron Job: Check expiry dates & generate mobile alerts."""
-    batches = db.query(Batch).filter(Batch.quantity > 0).options(joinedload(Batch.product)).all()
-    alerts = []
     today = date.today()
-    
-    for b in batches:
-        days = (b.expiry_date - today).days
-        status = "good"
-        if days <= 0: status = "expired"
-        elif days < 7: status = "critical" # Red
-        elif days <= 15: status = "warning" # Yellow
-        
-        # Only include non-good (Red/Yellow) in the push list?
-        # User says "These alerts will push". implying active alerts.
-        if status != "good":
-            alerts.append({
-                "product_name": b.product.name,
-                "batch_number": b.batch_number,
-                "expiry_date": str(b.expiry_date),
-                "days_left": days,
-                "status": status,
-                "health_score": "Red" if status in ["expired", "critical"] else "Yellow"
-            })
-            
+    total_checked = db.query(func.count(Batch.id)).filter(Batch.quantity > 0).scalar()
+
+    # Only non-good (Red/Yellow) batches are pushed, so only those are fetched
+    rows = _expiry_rows(db, today, Batch.expiry_date <= today + timedelta(days=15))
+    alerts = [
+        {
+            "product_name": r.product_name,
+            "batch_number": r.batch_number,
+            "expiry_date": str(r.expiry_date),
+            "days_left": (r.expiry_date - today).days,
+            "status": r.status,
+            "health_score": "Red" if r.status in ["expired", "critical"] else "Yellow"
+        }
+        for r in rows
+    ]
+
     return {
         "check_date": str(today),
-        "total_batches_checked": len(batches),
+        "total_batches_checked": total_checked,
         "alerts_generated": len(alerts),
         "mobile_sync_data": alerts
     }
 
-@app.get("/api/batches/expiring", response_model=List[ExpiryAlert])
-def get_expiring_batches(
-    days: int = Query(default=60, ge=0),
-    db: Session = Depends(get_db)
-):
-    """Get batches expiring within N days."""
-    cutoff = date.today() + timedelta(days=days)
-    batches = db.query(Batch).options(
-        joinedload(Batch.product)
-    ).filter(
-        Batch.expiry_date <= cutoff,
-        Batch.quantity > 0
-    ).order_by(Batch.expiry_date).all()
-
-    alerts = []
-    for b in batches:
-        days_left = (b.expiry_date - date.today()).days
-        if days_left <= 0:
-            status = "expired"
-        elif days_left < 7:
-            status = "critical"
-        elif days_left <= 15:
-            status = "warning"
-        else:
-            status = "good"
-
-        alerts.append(ExpiryAlert(
-            product_name=b.product.name,
-            item_id=b.product.item_id,
-            batch_id=b.id,
-            batch_number=b.batch_number,
-            expiry_date=b.expiry_date,
-            days_left=days_left,
-            quantity=b.quantity,
-            status=status,
-        ))
-    return alerts
-
-
 # ═══════════════════════════════════════════════════
 # SUPPLIER MANAGEMENT & POs
 # ═══════════════════════════════════════════════════
@@ -502,23 +594,154 @@ def list_purchase_orders(status: str = "draft", db: Session = Depends(get_db)):
         joinedload(PurchaseOrder.supplier),
         joinedload(PurchaseOrder.product)
     ).filter(PurchaseOrder.status == status).order_by(desc(PurchaseOrder.created_at)).all()
-    
-    # Enrich response manually if needed, or rely on ORM
-    results = []
-    for po in pos:
-        po_dict = po.__dict__.copy()
-        if po.supplier: po_dict["supplier_name"] = po.supplier.name
-        if po.product: po_dict["product_name"] = po.product.name
-        results.append(po_dict)
-    return results
+    # supplier_name / product_name are read from the eager-loaded relationships
+    return pos
 
 
 # ═══════════════════════════════════════════════════
 # TRANSACTIONS (POS)
 # ═══════════════════════════════════════════════════
 
+def _deduct_fifo(db: Session, product_id: int, quantity: int) -> int:
+    """Deduct `quantity` units across a product's batches, oldest expiry first.
+
+    One UPDATE ... FROM over a window CTE: each batch takes
+    min(its quantity, what is still owed after earlier batches). Nothing is
+    touched unless the product has enough stock in total. Returns the number
+    of batches updated (0 means insufficient stock).
+    """
+    running = func.sum(Batch.quantity).over(order_by=(Batch.expiry_date, Batch.id))
+    fifo = select(
+        Batch.id.label("id"),
+        (running - Batch.quantity).label("prior"),
+        func.sum(Batch.quantity).over().label("available"),
+    ).where(Batch.product_id == product_id, Batch.quantity > 0).cte("fifo")
+
+    owed = quantity - fifo.c.prior
+    deduction = case(
+        (owed <= 0, 0),
+        (Batch.quantity <= owed, Batch.quantity),
+        else_=owed,
+    )
+    updated = db.execute(
+        update(Batch)
+        .where(
+            Batch.id == fifo.c.id,
+            fifo.c.available >= quantity,
+            owed > 0,
+            Batch.quantity >= deduction,
+        )
+        .values(quantity=Batch.quantity - deduction)
+        .returning(Batch.id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    return len(updated)
+
+
+# Per-product 30-day average daily sales. A miss runs the SQL aggregate;
+# a hit is advanced by each new sale (quantity / 30) until the entry expires.
+_avg_sales_cache = TTLCache(maxsize=5000, ttl=3600)
+# Products known to have an open (draft/sent) PO. POs are closed outside the
+# API, so entries expire rather than being removed.
+_open_po_cache = TTLCache(maxsize=5000, ttl=300)
+_ml_cache_lock = threading.Lock()
+
+
+def invalidate_stockout_caches():
+    with _ml_cache_lock:
+        _avg_sales_cache.clear()
+        _open_po_cache.clear()
+
+
+def _avg_daily_sales(db: Session, product_id: int, quantity: int) -> float:
+    """Average daily sales over the last 30 days, including a just-recorded sale of `quantity`."""
+    with _ml_cache_lock:
+        if product_id in _avg_sales_cache:
+            _avg_sales_cache[product_id] += quantity / 30.0
+            return _avg_sales_cache[product_id]
+
+    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+    recent_sales_qty = db.query(func.sum(Transaction.quantity)).filter(
+        Transaction.product_id == product_id,
+        Transaction.transaction_type == "sale",
+        Transaction.transaction_date >= thirty_days_ago
+    ).scalar() or 0
+
+    # Simple moving average (smoothing factor)
+    avg_daily_sales = recent_sales_qty / 30.0
+    with _ml_cache_lock:
+        _avg_sales_cache[product_id] = avg_daily_sales
+    return avg_daily_sales
+
+
+def _has_open_po(db: Session, product_id: int) -> bool:
+    with _ml_cache_lock:
+        if product_id in _open_po_cache:
+            return True
+
+    existing_po = db.query(PurchaseOrder.id).filter(
+        PurchaseOrder.product_id == product_id,
+        PurchaseOrder.status.in_(["draft", "sent"])
+    ).first()
+    if existing_po:
+        with _ml_cache_lock:
+            _open_po_cache[product_id] = True
+    return existing_po is not None
+
+
+def run_stockout_check(bind, product_id: int, quantity: int):
+    """Real-time ML trigger: predict stock-out and draft a PO when it is < 2 days away."""
+    db = Session(bind=bind)
+    try:
+        product = db.query(Product).options(
+            undefer(Product.total_stock)
+        ).filter(Product.id == product_id).first()
+        if not product:
+            return
+
+        # 1. Calculate Average Daily Sales (Last 30 Days)
+        avg_daily_sales = _avg_daily_sales(db, product_id, quantity)
+        
+        # 2. Predict Stock-Out Date
+        current_stock = product.total_stock
+        if avg_daily_sales > 0.1: # Threshold to avoid division by near-zero
+            days_until_stockout = current_stock / avg_daily_sales
+            
+            # 3. Determine if critical (< 48 hours / 2 days)
+            if days_until_stockout <= 2.0:
+                # Check if active PO exists
+                if not _has_open_po(db, product_id):
+                    # Find Supplier for this category
+                    supplier = db.query(Supplier).filter(Supplier.category == product.category).first()
+                    if supplier:
+                        # Auto-calculate order quantity (e.g., 7 days of stock)
+                        order_qty = max(20, int(avg_daily_sales * 7)) # Min 20 units
+                        predicted_date = date.today() + timedelta(days=int(days_until_stockout))
+
+                        po = PurchaseOrder(
+                            supplier_id=supplier.id,
+                            product_id=product.id,
+                            quantity=order_qty,
+                            status="draft",
+                            predicted_stockout_date=predicted_date
+                        )
+                        db.add(po)
+                        db.commit()
+                        with _ml_cache_lock:
+                            _open_po_cache[product_id] = True
+                        print(f"🤖 ML Alert: Generated PO Draft for {product.name} (Stock out in {days_until_stockout:.1f} days)")
+    except Exception as e:
+        print(f"ML Trigger Error: {e}")
+    finally:
+        db.close()
+
+
 @app.post("/api/transactions", response_model=TransactionResponse)
-def create_transaction(data: TransactionCreate, db: Session = Depends(get_db)):
+def create_transaction(
+    data: TransactionCreate,
+    background: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Record a sale, wastage, or restock with Real-Time ML Stock Prediction."""
     product = db.query(Product).filter(Product.id == data.product_id).first()
     if not product:
@@ -526,20 +749,8 @@ def create_transaction(data: TransactionCreate, db: Session = Depends(get_db)):
 
     # For sales — deduct from oldest batch (FIFO)
     if data.transaction_type == "sale":
-        remaining = data.quantity
-        batches = db.query(Batch).filter(
-            Batch.product_id == data.product_id,
-            Batch.quantity > 0
-        ).order_by(Batch.expiry_date).all()
-
-        for batch in batches:
-            if remaining <= 0:
-                break
-            deduct = min(batch.quantity, remaining)
-            batch.quantity -= deduct
-            remaining -= deduct
-
-        if remaining > 0:
+        deducted = _deduct_fifo(db, data.product_id, data.quantity)
+        if data.quantity > 0 and deducted == 0:
             raise HTTPException(status_code=400, detail="Insufficient stock")
 
     elif data.transaction_type == "wastage":
@@ -560,55 +771,16 @@ def create_transaction(data: TransactionCreate, db: Session = Depends(get_db)):
     )
     db.add(tx)
     db.commit()
+    invalidate_dashboard_cache()
     db.refresh(tx)
+    # tx is fully loaded; hand the connection back now rather than after background tasks
+    # (FastAPI only closes yield dependencies once those have run)
+    db.close()
 
     # ─── REAL-TIME ML TRIGGER: Stock-Out Prediction & Auto-PO ───
+    # Runs after the response is sent, in its own session on the same engine
     if data.transaction_type == "sale":
-        try:
-            # 1. Calculate Average Daily Sales (Last 30 Days)
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            recent_sales_qty = db.query(func.sum(Transaction.quantity)).filter(
-                Transaction.product_id == data.product_id,
-                Transaction.transaction_type == "sale",
-                Transaction.transaction_date >= thirty_days_ago
-            ).scalar() or 0
-            
-            # Simple moving average (smoothing factor)
-            avg_daily_sales = recent_sales_qty / 30.0
-            
-            # 2. Predict Stock-Out Date
-            current_stock = product.total_stock
-            if avg_daily_sales > 0.1: # Threshold to avoid division by near-zero
-                days_until_stockout = current_stock / avg_daily_sales
-                
-                # 3. Determine if critical (< 48 hours / 2 days)
-                if days_until_stockout <= 2.0:
-                    # Check if active PO exists
-                    existing_po = db.query(PurchaseOrder).filter(
-                        PurchaseOrder.product_id == data.product_id,
-                        PurchaseOrder.status.in_(["draft", "sent"])
-                    ).first()
-                    
-                    if not existing_po:
-                        # Find Supplier for this category
-                        supplier = db.query(Supplier).filter(Supplier.category == product.category).first()
-                        if supplier:
-                            # Auto-calculate order quantity (e.g., 7 days of stock)
-                            order_qty = max(20, int(avg_daily_sales * 7)) # Min 20 units
-                            predicted_date = date.today() + timedelta(days=int(days_until_stockout))
-
-                            po = PurchaseOrder(
-                                supplier_id=supplier.id,
-                                product_id=product.id,
-                                quantity=order_qty,
-                                status="draft",
-                                predicted_stockout_date=predicted_date
-                            )
-                            db.add(po)
-                            db.commit()
-                            print(f"🤖 ML Alert: Generated PO Draft for {product.name} (Stock out in {days_until_stockout:.1f} days)")
-        except Exception as e:
-            print(f"ML Trigger Error: {e}")
+        background.add_task(run_stockout_check, db.get_bind(), data.product_id, data.quantity)
 
     return tx
 
@@ -617,7 +789,7 @@ def create_transaction(data: TransactionCreate, db: Session = Depends(get_db)):
 def list_transactions(
     transaction_type: Optional[str] = None,
     product_id: Optional[int] = None,
-    limit: int = 50,
+    limit: int = Query(default=50, ge=1, le=5000),
     db: Session = Depends(get_db)
 ):
     query = db.query(Transaction)
@@ -632,82 +804,75 @@ def list_transactions(
 # ANALYTICS & DASHBOARD
 # ═══════════════════════════════════════════════════
 
-@app.get("/api/dashboard", response_model=DashboardStats)
-def get_dashboard(db: Session = Depends(get_db)):
-    """Main dashboard overview with all key metrics."""
-    products = db.query(Product).options(joinedload(Product.batches)).all()
+# KPI polling cache. Writes bump the version instead of clearing, so a
+# response computed before a write can never be stored as current.
+KPI_CACHE_TTL_SECONDS = 5
+_kpi_cache = TTLCache(maxsize=8, ttl=KPI_CACHE_TTL_SECONDS)
+_kpi_cache_lock = threading.Lock()
+_dashboard_version = 0
 
-    total_products = len(products)
 
-    # Stock value from individual batch cost prices (accurate inventory valuation)
-    total_stock_value = 0.0
-    for p in products:
-        for b in p.batches:
-            if b.quantity > 0:
-                total_stock_value += b.quantity * b.cost_price
+def invalidate_dashboard_cache():
+    """Drop cached dashboard KPIs after a write that changes stock or sales."""
+    global _dashboard_version
+    with _kpi_cache_lock:
+        _dashboard_version += 1
 
-    # Revenue from sales
-    total_revenue = db.query(func.coalesce(func.sum(Transaction.total_amount), 0)).filter(
-        Transaction.transaction_type == "sale"
-    ).scalar()
 
-    # Wastage loss
-    total_wastage = db.query(func.coalesce(func.sum(Transaction.total_amount), 0)).filter(
-        Transaction.transaction_type == "wastage"
-    ).scalar()
+def _low_stock_query(db: Session):
+    """Products whose in-stock quantity is below min_stock, aggregated in SQL."""
+    current_stock = func.coalesce(func.sum(Batch.quantity), 0)
+    return db.query(
+        Product.id.label("product_id"), Product.name.label("product_name"),
+        Product.item_id, Product.min_stock, Product.category,
+        current_stock.label("current_stock"),
+    ).outerjoin(
+        Batch, and_(Batch.product_id == Product.id, Batch.quantity > 0)
+    ).group_by(Product.id).having(current_stock < Product.min_stock)
+
+
+def _txn_total(transaction_type: str):
+    return select(func.coalesce(func.sum(Transaction.total_amount), 0)).where(
+        Transaction.transaction_type == transaction_type
+    ).scalar_subquery()
+
+
+def _dashboard_totals(db: Session, at_risk_days: int = 15):
+    """All headline dashboard totals in one round trip.
+
+    Each total is a scalar subquery of a single SELECT, so the result is one
+    typed row rather than a (label, value) rowset to unpack.
+    """
+    active = Batch.quantity > 0
+    return db.execute(select(
+        select(func.count(Product.id)).scalar_subquery().label("total_products"),
+        select(func.coalesce(func.sum(Batch.quantity * Batch.cost_price), 0)).where(
+            active
+        ).scalar_subquery().label("stock_value"),
+        _txn_total("sale").label("revenue"),
+        _txn_total("wastage").label("wastage"),
+        select(func.count(Batch.id)).where(active).scalar_subquery().label("total_batches"),
+        select(func.count(Batch.id)).where(
+            active, Batch.expiry_date <= date.today() + timedelta(days=at_risk_days)
+        ).scalar_subquery().label("at_risk"),
+        select(func.count()).select_from(
+            _low_stock_query(db).subquery()
+        ).scalar_subquery().label("low_stock"),
+    )).one()
 
-    # ALL active batches (qty > 0) — same scope as Expiry Monitor (365 days)
-    expiry_cutoff = date.today() + timedelta(days=365)
-    all_batches = db.query(Batch).options(
-        joinedload(Batch.product)
-    ).filter(
-        Batch.expiry_date <= expiry_cutoff,
-        Batch.quantity > 0
-    ).order_by(Batch.expiry_date).all()
-
-    total_batches = len(all_batches)
-
-    expiry_alerts = []
-    expiring_soon_count = 0
-    for b in all_batches:
-        days_left = (b.expiry_date - date.today()).days
-        if days_left <= 0:
-            status = "expired"
-        elif days_left < 7:
-            status = "critical"
-        elif days_left <= 15:
-            status = "warning"
-        else:
-            status = "good"
-
-        # Count at-risk batches (expired + critical + warning)
-        if status != "good":
-            expiring_soon_count += 1
-
-        expiry_alerts.append(ExpiryAlert(
-            product_id=b.product.id,
-            product_name=b.product.name,
-            item_id=b.product.item_id,
-            batch_id=b.id,
-            batch_number=b.batch_number,
-            expiry_date=b.expiry_date,
-            days_left=days_left,
-            quantity=b.quantity,
-            status=status,
-        ))
+
+@app.get("/api/dashboard", response_model=DashboardStats)
+def get_dashboard(db: Session = Depends(get_db)):
+    """Main dashboard overview with all key metrics."""
+    # Product/batch counts, stock value (batch cost prices), revenue, wastage loss and
+    # at-risk (≤15 days) / low-stock counts — the same totals the KPI endpoint serves
+    totals = _dashboard_totals(db)
+
+    # Active batches (qty > 0) listed with the Expiry Monitor's 365-day scope
+    expiry_alerts = _expiry_alerts(db, 365)
 
     # Low stock alerts
-    stock_alerts = []
-    for p in products:
-        if p.total_stock < p.min_stock:
-            stock_alerts.append(StockAlert(
-                product_id=p.id,
-                product_name=p.name,
-                item_id=p.item_id,
-                current_stock=p.total_stock,
-                min_stock=p.min_stock,
-                category=p.category,
-            ))
+    stock_alerts = [dict(r._mapping) for r in _low_stock_query(db)]
 
     # Category sales
     cat_sales_raw = db.query(
@@ -719,72 +884,54 @@ def get_dashboard(db: Session = Depends(get_db)):
     ).group_by(Product.category).all()
 
     category_sales = [
-        CategorySales(category=c, total_sales=round(s, 2), total_quantity=int(q))
+        {"category": c, "total_sales": round(float(s), 2), "total_quantity": int(q)}
         for c, s, q in cat_sales_raw
     ]
 
-    # Recent transactions
-    recent = db.query(Transaction).order_by(
-        desc(Transaction.transaction_date)
-    ).limit(10).all()
-
-    return DashboardStats(
-        total_products=total_products,
-        total_batches=total_batches,
-        total_stock_value=round(total_stock_value, 2),
-        total_revenue=round(float(total_revenue), 2),
-        total_wastage_loss=round(float(total_wastage), 2),
-        expiring_soon=expiring_soon_count,
-        low_stock_count=len(stock_alerts),
-        expiry_alerts=expiry_alerts,
-        stock_alerts=stock_alerts,
-        category_sales=category_sales,
-        recent_transactions=recent,
-    )
+    # Recent transactions (only the TransactionResponse columns)
+    recent = db.query(
+        *(getattr(Transaction, field) for field in TransactionResponse.model_fields)
+    ).order_by(desc(Transaction.transaction_date)).limit(10)
+
+    # Assembled as plain dicts and dumped by orjson; DashboardStats documents the shape
+    return ORJSONResponse({
+        "total_products": totals.total_products,
+        "total_batches": totals.total_batches,
+        "total_stock_value": round(float(totals.stock_value), 2),
+        "total_revenue": round(float(totals.revenue), 2),
+        "total_wastage_loss": round(float(totals.wastage), 2),
+        "expiring_soon": totals.at_risk,
+        "low_stock_count": totals.low_stock,
+        "expiry_alerts": expiry_alerts,
+        "stock_alerts": stock_alerts,
+        "category_sales": category_sales,
+        "recent_transactions": [dict(r._mapping) for r in recent],
+    })
 
 
 @app.get("/api/dashboard/kpi")
 def get_dashboard_kpi(db: Session = Depends(get_db)):
     """Lightweight KPI-only endpoint for real-time polling (no heavy lists)."""
-    products = db.query(Product).options(joinedload(Product.batches)).all()
-
-    total_products = len(products)
-
-    # Stock value from batch-level cost prices
-    total_stock_value = 0.0
-    total_batches = 0
-    for p in products:
-        for b in p.batches:
-            if b.quantity > 0:
-                total_stock_value += b.quantity * b.cost_price
-                total_batches += 1
-
-    total_revenue = db.query(func.coalesce(func.sum(Transaction.total_amount), 0)).filter(
-        Transaction.transaction_type == "sale"
-    ).scalar()
-
-    total_wastage = db.query(func.coalesce(func.sum(Transaction.total_amount), 0)).filter(
-        Transaction.transaction_type == "wastage"
-    ).scalar()
-
-    # Count at-risk batches
-    expiry_cutoff = date.today() + timedelta(days=15)
-    at_risk = db.query(func.count(Batch.id)).filter(
-        Batch.expiry_date <= expiry_cutoff,
-        Batch.quantity > 0
-    ).scalar()
-
-    low_stock = sum(1 for p in products if p.total_stock < p.min_stock)
-
-    return {
-        "total_products": total_products,
-        "total_batches": total_batches,
-        "total_stock_value": round(total_stock_value, 2),
-        "total_revenue": round(float(total_revenue), 2),
-        "total_wastage_loss": round(float(total_wastage), 2),
-        "expiring_soon": at_risk,
-        "low_stock_count": low_stock,
+    with _kpi_cache_lock:
+        version = _dashboard_version
+        cached = _kpi_cache.get(version)
+    if cached is not None:
+        return cached
+
+    totals = _dashboard_totals(db)
+
+    kpi = {
+        "total_products": totals.total_products,
+        "total_batches": totals.total_batches,
+        "total_stock_value": round(float(totals.stock_value), 2),
+        "total_revenue": round(float(totals.revenue), 2),
+        "total_wastage_loss": round(float(totals.wastage), 2),
+        "expiring_soon": totals.at_risk,
+        "low_stock_count": totals.low_stock,
     }
+    with _kpi_cache_lock:
+        _kpi_cache[version] = kpi
+    return kpi
 
 
 @app.get("/api/analytics/revenue")
@@ -793,41 +940,32 @@ def revenue_analytics(
     db: Session = Depends(get_db)
 ):
     """Daily revenue over the last N days."""
-    from sqlalchemy import String, cast
     start_date = datetime.now() - timedelta(days=days)
 
-    # Database-agnostic date grouping (works on both SQLite + PostgreSQL)
-    day_expr = func.substr(cast(Transaction.transaction_date, String), 1, 10)
-
-    sales = db.query(
-        day_expr.label("day"),
-        func.sum(Transaction.total_amount).label("total"),
-    ).filter(
-        Transaction.transaction_date >= start_date,
-        Transaction.transaction_type == "sale"
-    ).group_by(day_expr).all()
+    # Calendar day of each transaction, in the dialect's native date function
+    if db.get_bind().dialect.name == "postgresql":
+        day_expr = cast(Transaction.transaction_date, Date)
+    else:
+        day_expr = func.date(Transaction.transaction_date)
 
-    wastages = db.query(
+    # Sales and wastage summed side by side in one pass
+    rows = db.query(
         day_expr.label("day"),
-        func.sum(Transaction.total_amount).label("total"),
+        func.sum(case((Transaction.transaction_type == "sale", Transaction.total_amount), else_=0)).label("revenue"),
+        func.sum(case((Transaction.transaction_type == "wastage", Transaction.total_amount), else_=0)).label("wastage"),
     ).filter(
         Transaction.transaction_date >= start_date,
-        Transaction.transaction_type == "wastage"
-    ).group_by(day_expr).all()
-
-    # Combine results
-    revenue_map = {r.day: float(r.total or 0) for r in sales}
-    wastage_map = {w.day: float(w.total or 0) for w in wastages}
-    all_days = sorted(set(list(revenue_map.keys()) + list(wastage_map.keys())))
+        Transaction.transaction_type.in_(["sale", "wastage"])
+    ).group_by(day_expr).order_by(day_expr).all()
 
     return [
         {
-            "date": day,
-            "revenue": round(revenue_map.get(day, 0), 2),
-            "wastage": round(wastage_map.get(day, 0), 2),
-            "net": round(revenue_map.get(day, 0) - wastage_map.get(day, 0), 2),
+            "date": str(r.day),
+            "revenue": round(float(r.revenue or 0), 2),
+            "wastage": round(float(r.wastage or 0), 2),
+            "net": round(float(r.revenue or 0) - float(r.wastage or 0), 2),
         }
-        for day in all_days
+        for r in rows
     ]
 
 
@@ -857,7 +995,7 @@ def wastage_report(db: Session = Depends(get_db)):
 @app.get("/api/analytics/categories")
 def category_breakdown(db: Session = Depends(get_db)):
     """Category-wise stock and sales breakdown."""
-    products = db.query(Product).options(joinedload(Product.batches)).all()
+    products = db.query(Product).options(undefer(Product.total_stock), raiseload("*")).all()
 
     categories = {}
     for p in products:
@@ -894,19 +1032,25 @@ def get_seasonal_predictions(
     if category:
         target_cats = [category]
     else:
-        cats = db.query(Product.category).distinct().all()
-        target_cats = [c[0] for c in cats]
+        target_cats = _product_categories(db)
 
-    target_months = [month] if month else range(1, 13)
-    
-    predictions = []
-    for cat in target_cats:
-        for m in target_months:
-            # seasonal_analyzer now has heuristic fallback if not trained
-            pred = seasonal_analyzer.predict_demand(cat, m)
-            predictions.append(pred)
+    target_months = np.array([month]) if month else np.arange(1, 13)
+
+    # seasonal_analyzer has a heuristic fallback for untrained categories
+    demand = seasonal_analyzer.predict_demand_batch(target_cats, target_months)
 
-    return predictions
+    # Rows are already SeasonalPattern-shaped; return them without re-validation
+    return ORJSONResponse([
+        {
+            "category": cat,
+            "month": int(m),
+            "month_name": MONTH_NAMES[m],
+            "predicted_demand": float(demand[i, j]),
+            "confidence": seasonal_analyzer.confidence(cat),
+        }
+        for i, cat in enumerate(target_cats)
+        for j, m in enumerate(target_months)
+    ])
 
 
 @app.get("/api/ml/insights")
@@ -920,8 +1064,7 @@ def get_ml_insights():
 @app.get("/api/categories")
 def list_categories(db: Session = Depends(get_db)):
     """List all unique categories."""
-    cats = db.query(Product.category).distinct().all()
-    return [c[0] for c in cats]
+    return _product_categories(db)
 
 
 # ──── Mount Static Files (MUST be after all API routes) ────
@@ -4,23 +4,78 @@ Analyzes historical sales data to predict seasonal trends per category.
 """
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import calendar
+import math
+from collections import defaultdict
+from functools import lru_cache
+from backend.models import ItemCategory
+
+# calendar.month_name re-resolves the locale on every index; snapshot it once
+MONTH_NAMES = tuple(calendar.month_name)
+
+
+def _fit_design(design: np.ndarray, y) -> np.ndarray:
+    """Least-squares coefficients for rows of an [1, x, x²] design matrix."""
+    coef, *_ = np.linalg.lstsq(design, np.asarray(y, dtype=np.float64), rcond=None)
+    return coef
+
+
+def _fit_quadratic(x, y) -> np.ndarray:
+    """Least-squares quadratic fit; returns [c0, c1, c2] for c0 + c1·x + c2·x²."""
+    return _fit_design(np.vander(np.asarray(x, dtype=np.float64), 3, increasing=True), y)
+
+
+def _eval_demand(design: np.ndarray, coefs: np.ndarray) -> np.ndarray:
+    """Non-negative demand of each (C, 3) coefficient row at each design row, shape (len(design), C)."""
+    return np.maximum(design @ coefs.T, 0)
+
+
+# Fallback heuristics for when no data exists: keyword buckets, first match wins,
+# each with a Jan..Dec demand multiplier on an arbitrary base.
+_HEURISTIC_BASE_DEMAND = 50.0
+_FLAT_MULTIPLIERS = np.ones(12)
+_HEURISTIC_BUCKETS = (
+    # 1. Beverages / Summer: Apr-Jul up, winter (Dec-Feb) down
+    (("drink", "beverage", "juice", "cold"),
+     np.array([0.6, 0.6, 1.0, 1.8, 1.8, 1.8, 1.8, 1.0, 1.0, 1.0, 1.0, 0.6])),
+    # 2. Ice Cream / Frozen: Apr-Aug up, otherwise down
+    (("cream", "frozen"),
+     np.array([0.5, 0.5, 0.5, 2.0, 2.0, 2.0, 2.0, 2.0, 0.5, 0.5, 0.5, 0.5])),
+    # 3. Stationery / Exams (Mar, Apr, Nov, Dec), new semester in Jun
+    (("stationery", "book", "pen"),
+     np.array([1.0, 1.0, 1.5, 1.5, 1.0, 1.3, 1.0, 1.0, 1.0, 1.0, 1.5, 1.5])),
+    # 4. Snacks / General: festive season (Oct-Dec)
+    (("snack", "food"),
+     np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.2, 1.2, 1.2])),
+)
 
 
 class SeasonalAnalyzer:
     """Detects and predicts seasonal purchasing patterns."""
 
+    # Quadratic design matrix [1, m, m²] for months 1..12
+    _MONTHS = np.arange(1, 13)
+    _MONTH_DESIGN = np.array([[1, m, m * m] for m in range(1, 13)], dtype=np.float64)
+
     def __init__(self):
-        self.models: Dict[str, LinearRegression] = {}
+        self.models: Dict[str, Dict] = {}
         self.is_trained = False
+        # Ordered set of every category to forecast: the catalog enum plus any seen in training data
+        self._known_categories: Dict[str, None] = dict.fromkeys(c.value for c in ItemCategory)
+        # (category, month) -> prediction for trained categories; rebuilt lazily after each training run
+        self._predictions: Dict[Tuple[str, int], Dict] = {}
+        self._all_predictions: Optional[List[Dict]] = None
+        self._insights: Optional[List[Dict]] = None
 
     def train_from_csv(self, csv_path: str):
         """Train seasonal models from the provided sales dataset."""
         try:
-            df = pd.read_csv(csv_path)
+            df = pd.read_csv(
+                csv_path,
+                usecols=["Item_Type", "Outlet_Establishment_Year", "Item_Outlet_Sales"],
+                dtype={"Item_Type": "category"},
+            )
             self._train(df)
         except Exception as e:
             print(f"ML Training error: {e}")
@@ -30,182 +85,212 @@ class SeasonalAnalyzer:
         if not transactions:
             return
 
-        data = []
-        for t in transactions:
-            data.append({
-                "category": t.product.category if t.product else "Unknown",
-                "month": t.transaction_date.month,
-                "quantity": t.quantity,
-                "amount": t.total_amount,
-            })
-        df = pd.DataFrame(data)
-        self._train_from_sales(df)
+        self._fit_sales(
+            (t.product.category if t.product else "Unknown", t.transaction_date.month, t.quantity)
+            for t in transactions
+        )
+
+    def _reset_caches(self):
+        """Drop memoized predictions/insights; called once self.models has changed."""
+        self._predictions.clear()
+        self._all_predictions = None
+        self._insights = None
 
     def _train(self, df: pd.DataFrame):
         """Train models from the original CSV dataset."""
-        categories = df["Item_Type"].unique()
-
-        for category in categories:
-            cat_data = df[df["Item_Type"] == category]
-
+        # One grouping pass instead of a boolean mask per category; first-seen order
+        for category, cat_data in df.groupby("Item_Type", observed=True, sort=False):
+            self._known_categories.setdefault(category)
             # Use outlet establishment year as time proxy for seasonality
             # Group by year to create time-series-like data
-            yearly = cat_data.groupby("Outlet_Establishment_Year").agg({
-                "Item_Outlet_Sales": "mean",
-                "Item_MRP": "mean"
-            }).reset_index()
+            yearly = cat_data.groupby("Outlet_Establishment_Year")["Item_Outlet_Sales"].mean().reset_index()
 
             if len(yearly) < 3:
                 continue
 
-            X = yearly[["Outlet_Establishment_Year"]].values
+            # Years as 1-based offsets so the trend is read on the same scale as months 1..12
+            years = yearly["Outlet_Establishment_Year"].values
+            x = years - years.min() + 1
             y = yearly["Item_Outlet_Sales"].values
 
             # Polynomial regression for trend detection
-            poly = PolynomialFeatures(degree=2)
-            X_poly = poly.fit_transform(X)
-
-            model = LinearRegression()
-            model.fit(X_poly, y)
+            mean_sales, std_sales = cat_data["Item_Outlet_Sales"].agg(["mean", "std"])
             self.models[category] = {
-                "model": model,
-                "poly": poly,
-                "mean_sales": cat_data["Item_Outlet_Sales"].mean(),
-                "std_sales": cat_data["Item_Outlet_Sales"].std(),
+                "coef": _fit_quadratic(x, y),
+                "mean_sales": mean_sales,
+                "std_sales": std_sales,
                 "data_points": len(cat_data)
             }
 
+        self._reset_caches()
         self.is_trained = True
 
     def _train_from_sales(self, df: pd.DataFrame):
         """Train from actual sales transaction data."""
-        categories = df["category"].unique()
-
-        for category in categories:
-            cat_data = df[df["category"] == category]
-            monthly = cat_data.groupby("month").agg({
-                "quantity": "sum",
-                "amount": "sum"
-            }).reset_index()
-
-            if len(monthly) < 2:
+        self._fit_sales(zip(df["category"], df["month"], df["quantity"]))
+
+    def _fit_sales(self, rows):
+        """Fit per-category monthly models from (category, month, quantity) rows in one pass."""
+        monthly_qty = defaultdict(lambda: [0] * 12)
+        monthly_rows = defaultdict(lambda: [0] * 12)
+        # Σq² alongside the monthly Σq and row counts gives mean/std without a second pass
+        sum_sq = defaultdict(int)
+        for category, month, quantity in rows:
+            monthly_qty[category][month - 1] += quantity
+            monthly_rows[category][month - 1] += 1
+            sum_sq[category] += quantity * quantity
+
+        for category, totals in monthly_qty.items():
+            self._known_categories.setdefault(category)
+            # Fit only the months that actually had sales
+            seen = np.array(monthly_rows[category]) > 0
+            if seen.sum() < 2:
                 continue
 
-            X = monthly[["month"]].values
-            y = monthly["quantity"].values
-
-            poly = PolynomialFeatures(degree=2)
-            X_poly = poly.fit_transform(X)
-
-            model = LinearRegression()
-            model.fit(X_poly, y)
+            n = sum(monthly_rows[category])
+            total = sum(totals)
+            variance = max(0.0, (sum_sq[category] - total * total / n) / (n - 1))
             self.models[category] = {
-                "model": model,
-                "poly": poly,
-                "mean_sales": cat_data["quantity"].mean(),
-                "std_sales": cat_data["quantity"].std(),
-                "data_points": len(cat_data)
+                # Month rows of the shared design instead of a fresh Vandermonde per category
+                "coef": _fit_design(self._MONTH_DESIGN[seen], np.array(totals)[seen]),
+                "mean_sales": total / n,
+                "std_sales": math.sqrt(variance),
+                "data_points": n
             }
 
+        self._reset_caches()
         self.is_trained = True
 
-    def _get_heuristic_prediction(self, category: str, month: int) -> float:
-        """Fallback heuristics for when no data exists."""
-        base_demand = 50.0  # arbitrary base
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _heuristic_multipliers(category: str) -> np.ndarray:
+        """Month multipliers (Jan..Dec) of the first keyword bucket matching `category`."""
         cat = category.lower()
-        multiplier = 1.0
-
-        # 1. Beverages / Summer
-        if "drink" in cat or "beverage" in cat or "juice" in cat or "cold" in cat:
-            if 4 <= month <= 7:  # Apr-Jul
-                multiplier = 1.8
-            elif month in [12, 1, 2]:  # Winter
-                multiplier = 0.6
-
-        # 2. Ice Cream / Frozen
-        elif "cream" in cat or "frozen" in cat:
-            if 4 <= month <= 8:
-                multiplier = 2.0
-            else:
-                multiplier = 0.5
-
-        # 3. Stationery / Exams (Mar, Apr, Nov, Dec)
-        elif "stationery" in cat or "book" in cat or "pen" in cat:
-            if month in [3, 4, 11, 12]:
-                multiplier = 1.5
-            elif month == 6:  # New semester
-                multiplier = 1.3
-
-        # 4. Snacks / General
-        elif "snack" in cat or "food" in cat:
-            if month in [10, 11, 12]:  # Festive season
-                multiplier = 1.2
-
-        return round(base_demand * multiplier, 2)
+        for keywords, multipliers in _HEURISTIC_BUCKETS:
+            if any(k in cat for k in keywords):
+                return multipliers
+        return _FLAT_MULTIPLIERS
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _get_heuristic_prediction(category: str, month: int) -> float:
+        """Fallback heuristics for when no data exists (pure, so memoized)."""
+        multipliers = SeasonalAnalyzer._heuristic_multipliers(category)
+        return round(float(_HEURISTIC_BASE_DEMAND * multipliers[month - 1]), 2)
 
     def predict_demand(self, category: str, month: int) -> Dict:
         """Predict demand for a category in a given month."""
+        cached = self._predictions.get((category, month))
+        if cached is not None:
+            return cached
+
         if category not in self.models:
             # Use heuristic
             pred = self._get_heuristic_prediction(category, month)
             return {
                 "category": category,
                 "month": month,
-                "month_name": calendar.month_name[month],
+                "month_name": MONTH_NAMES[month],
                 "predicted_demand": pred,
-                "confidence": 0.5  # Medium confidence for heuristics
+                "confidence": self.confidence(category)
             }
 
-        model_info = self.models[category]
-        model = model_info["model"]
-        poly = model_info["poly"]
-
-        X_pred = poly.transform([[month]])
-        prediction = max(0, model.predict(X_pred)[0])
+        c0, c1, c2 = self.models[category]["coef"]
+        prediction = max(0, float(c0 + c1 * month + c2 * month * month))
 
-        # Confidence based on data points
-        confidence = min(1.0, model_info["data_points"] / 50)
-
-        return {
+        result = {
             "category": category,
             "month": month,
-            "month_name": calendar.month_name[month],
+            "month_name": MONTH_NAMES[month],
             "predicted_demand": round(prediction, 2),
-            "confidence": round(confidence, 2)
+            "confidence": self.confidence(category)
         }
+        self._predictions[(category, month)] = result
+        return result
+
+    def confidence(self, category: str) -> float:
+        """Confidence based on data points; medium (0.5) for heuristics."""
+        model_info = self.models.get(category)
+        if model_info is None:
+            return 0.5
+        return round(min(1.0, model_info["data_points"] / 50), 2)
+
+    def predict_demand_batch(self, categories: List[str], months: np.ndarray) -> np.ndarray:
+        """Predicted demand for every (category, month) pair, shape (len(categories), len(months)).
+
+        All trained categories are evaluated for all months in one matrix product.
+        """
+        months = np.asarray(months)
+        demand = np.empty((len(categories), len(months)))
+        trained = []
+        for i, category in enumerate(categories):
+            if category in self.models:
+                trained.append(i)
+            else:
+                demand[i] = _HEURISTIC_BASE_DEMAND * self._heuristic_multipliers(category)[months - 1]
+        if trained:
+            # Rows of the precomputed [1, m, m²] month design; months are 1..12
+            coefs = np.stack([self.models[categories[i]]["coef"] for i in trained])
+            demand[trained] = _eval_demand(self._MONTH_DESIGN[months - 1], coefs).T
+        return np.round(demand, 2)
 
     def get_all_predictions(self) -> List[Dict]:
-        """Get predictions for all categories across all months."""
-        predictions = []
-        for category in self.models:
-            for month in range(1, 13):
-                pred = self.predict_demand(category, month)
-                predictions.append(pred)
+        """Get predictions for all known categories across all months.
+
+        Untrained categories fall back to the heuristic tables.
+        """
+        if self._all_predictions is not None:
+            return self._all_predictions
+        categories = list(self._known_categories)
+        demand = self.predict_demand_batch(categories, self._MONTHS)
+        predictions = [
+            {
+                "category": category,
+                "month": month,
+                "month_name": month_name,
+                "predicted_demand": predicted,
+                "confidence": self.confidence(category)
+            }
+            for category, row in zip(categories, demand.tolist())
+            for month, month_name, predicted in zip(range(1, 13), MONTH_NAMES[1:], row)
+        ]
+        self._all_predictions = predictions
         return predictions
 
     def get_category_insights(self) -> List[Dict]:
         """Get summary insights per category."""
-        insights = []
-        for category, info in self.models.items():
-            monthly_preds = []
-            for m in range(1, 13):
-                pred = self.predict_demand(category, m)
-                monthly_preds.append(pred["predicted_demand"])
-
-            peak_month = np.argmax(monthly_preds) + 1
-            low_month = np.argmin(monthly_preds) + 1
+        if self._insights is not None:
+            return self._insights
+        if not self.models:
+            return []
+
+        # All categories × 12 months in one (12, 3) @ (3, C) product
+        categories = list(self.models)
+        coefs = np.stack([self.models[c]["coef"] for c in categories])
+        preds = np.round(_eval_demand(self._MONTH_DESIGN, coefs), 2)
+
+        peak_months = np.argmax(preds, axis=0) + 1
+        low_months = np.argmin(preds, axis=0) + 1
+        means = preds.mean(axis=0)
+        peaks = preds.max(axis=0)
+        lows = preds.min(axis=0)
+        volatility = preds.std(axis=0)
 
+        insights = []
+        for i, category in enumerate(categories):
+            info = self.models[category]
             insights.append({
                 "category": category,
-                "mean_demand": round(np.mean(monthly_preds), 2),
-                "peak_month": calendar.month_name[peak_month],
-                "low_month": calendar.month_name[low_month],
-                "peak_demand": round(max(monthly_preds), 2),
-                "low_demand": round(min(monthly_preds), 2),
-                "volatility": round(np.std(monthly_preds), 2),
+                "mean_demand": round(float(means[i]), 2),
+                "peak_month": MONTH_NAMES[peak_months[i]],
+                "low_month": MONTH_NAMES[low_months[i]],
+                "peak_demand": round(float(peaks[i]), 2),
+                "low_demand": round(float(lows[i]), 2),
+                "volatility": round(float(volatility[i]), 2),
                 "data_points": info["data_points"],
                 "confidence": round(min(1.0, info["data_points"] / 50), 2)
             })
+        self._insights = insights
         return insights
 
 
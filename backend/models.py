@@ -3,13 +3,17 @@ SQLAlchemy ORM models for the Smart Campus Store.
 Supports batch-level inventory tracking with expiry dates.
 """
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, Date,
-    ForeignKey, Enum as SQLEnum, Text
+    Column, Integer, SmallInteger, String, Numeric, DateTime, Date,
+    DDL, ForeignKey, Enum as SQLEnum, Text, Index, event, select
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql import func
 from backend.database import Base
 import enum
+from datetime import date
+
+# Currency columns: fixed-point in the database, plain floats in Python/JSON
+Money = Numeric(10, 2, asdecimal=False)
 
 
 class UserRole(str, enum.Enum):
@@ -26,7 +30,7 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(100), nullable=False)
     role = Column(String(20), nullable=False, default="staff")
-    is_active = Column(Integer, default=1)
+    is_active = Column(SmallInteger, default=1)
     created_at = Column(DateTime, server_default=func.now())
 
 
@@ -51,16 +55,24 @@ class TransactionType(str, enum.Enum):
 class Product(Base):
     """Master product catalog — one entry per unique product."""
     __tablename__ = "products"
+    __table_args__ = (
+        # Trigram index so name ILIKE '%term%' searches avoid a sequential scan (PostgreSQL only)
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     item_id = Column(String(20), unique=True, nullable=False, index=True)
     name = Column(String(200), nullable=False)
-    category = Column(String(50), nullable=False)
+    category = Column(String(50), nullable=False, index=True)
     fat_content = Column(String(20), default="Regular")
-    weight = Column(Float, default=0.0)
-    mrp = Column(Float, nullable=False)
+    weight = Column(Numeric(8, 3, asdecimal=False), default=0.0)
+    mrp = Column(Money, nullable=False)
     barcode = Column(String(50), unique=True, nullable=True, index=True)
-    min_stock = Column(Integer, default=10)
+    min_stock = Column(SmallInteger, default=10)
     image_url = Column(String(500), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -68,9 +80,12 @@ class Product(Base):
     batches = relationship("Batch", back_populates="product", cascade="all, delete-orphan")
     transactions = relationship("Transaction", back_populates="product", cascade="all, delete-orphan")
 
-    @property
-    def total_stock(self):
-        return sum(b.quantity for b in self.batches if b.quantity > 0)
+
+event.listen(
+    Product.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
 
 
 class Batch(Base):
@@ -79,23 +94,33 @@ class Batch(Base):
     Enables per-batch expiry tracking and FIFO selling.
     """
     __tablename__ = "batches"
+    __table_args__ = (
+        # Expiry scans: expiry_date <= cutoff AND quantity > 0
+        Index("ix_batches_expiry_qty", "expiry_date", "quantity"),
+        # Per-product FIFO / pulse lookups: product_id = ? ORDER BY (or range on) expiry_date
+        Index("ix_batches_product_expiry", "product_id", "expiry_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     batch_number = Column(String(50), nullable=False)
     quantity = Column(Integer, nullable=False, default=0)
-    cost_price = Column(Float, default=0.0)
+    cost_price = Column(Money, default=0.0)
     manufacture_date = Column(Date, nullable=True)
     expiry_date = Column(Date, nullable=False)
     received_date = Column(DateTime, server_default=func.now())
 
     product = relationship("Product", back_populates="batches")
 
-    @property
-    def expiry_status(self):
-        """🔴 expired/≤7 days, 🟡 ≤15 days, 🟢 fresh"""
-        from datetime import date
-        days_left = (self.expiry_date - date.today()).days
+    @staticmethod
+    def days_for(expiry_date, today) -> int:
+        """Days from `today` until `expiry_date` (negative once expired)."""
+        return (expiry_date - today).days
+
+    @staticmethod
+    def status_for(expiry_date, today) -> str:
+        """🔴 expired/≤7 days, 🟡 ≤15 days, 🟢 fresh — relative to a caller-supplied `today`."""
+        days_left = (expiry_date - today).days
         if days_left <= 0:
             return "expired"
         elif days_left <= 7:
@@ -105,23 +130,44 @@ class Batch(Base):
         else:
             return "fresh"
 
+    @property
+    def expiry_status(self):
+        """🔴 expired/≤7 days, 🟡 ≤15 days, 🟢 fresh"""
+        return Batch.status_for(self.expiry_date, date.today())
+
     @property
     def days_until_expiry(self):
-        from datetime import date
-        return (self.expiry_date - date.today()).days
+        return Batch.days_for(self.expiry_date, date.today())
+
+
+# Summed in SQL (correlated subquery) rather than by loading Product.batches.
+# Deferred: endpoints that need it for many rows use undefer(Product.total_stock).
+Product.total_stock = column_property(
+    select(func.coalesce(func.sum(Batch.quantity), 0))
+    .where(Batch.product_id == Product.id, Batch.quantity > 0)
+    .correlate_except(Batch)
+    .scalar_subquery(),
+    deferred=True,
+)
 
 
 class Transaction(Base):
     """Sales, wastage, and restock records."""
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Per-product sales windows: product_id = ? AND transaction_type = ? AND transaction_date >= ?
+        Index("ix_transactions_product_type_date", "product_id", "transaction_type", "transaction_date"),
+        # Store-wide date ranges and "most recent first" listings
+        Index("ix_transactions_date", "transaction_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     batch_id = Column(Integer, ForeignKey("batches.id"), nullable=True)
     transaction_type = Column(String(20), nullable=False)
     quantity = Column(Integer, nullable=False)
-    unit_price = Column(Float, default=0.0)
-    total_amount = Column(Float, default=0.0)
+    unit_price = Column(Money, default=0.0)
+    total_amount = Column(Money, default=0.0)
     transaction_date = Column(DateTime, server_default=func.now())
     notes = Column(Text, nullable=True)
 
@@ -154,3 +200,11 @@ class PurchaseOrder(Base):
 
     supplier = relationship("Supplier")
     product = relationship("Product")
+
+    @property
+    def supplier_name(self):
+        return self.supplier.name if self.supplier else None
+
+    @property
+    def product_name(self):
+        return self.product.name if self.product else None
@@ -1,20 +1,25 @@
 """
 Pydantic schemas for request/response validation.
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import date, datetime
 
 
 # ─── Product Schemas ───
+# Column limits: weight is NUMERIC(8,3) (grams), min_stock is SMALLINT
+MAX_WEIGHT = 99999.999
+MAX_MIN_STOCK = 32767
+
+
 class ProductBase(BaseModel):
     name: str
     category: str
     fat_content: str = "Regular"
-    weight: float = 0.0
+    weight: float = Field(default=0.0, ge=0, le=MAX_WEIGHT)
     mrp: float
     barcode: Optional[str] = None
-    min_stock: int = 10
+    min_stock: int = Field(default=10, ge=0, le=MAX_MIN_STOCK)
     image_url: Optional[str] = None
 
 
@@ -26,7 +31,7 @@ class ProductUpdate(BaseModel):
     name: Optional[str] = None
     category: Optional[str] = None
     mrp: Optional[float] = None
-    min_stock: Optional[int] = None
+    min_stock: Optional[int] = Field(default=None, ge=0, le=MAX_MIN_STOCK)
     barcode: Optional[str] = None
 
 
@@ -40,8 +45,7 @@ class BatchInfo(BaseModel):
     expiry_status: str
     days_until_expiry: int
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ProductResponse(ProductBase):
@@ -51,8 +55,7 @@ class ProductResponse(ProductBase):
     batches: List[BatchInfo] = []
     created_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ─── Batch Schemas ───
@@ -85,8 +88,7 @@ class TransactionResponse(BaseModel):
     transaction_date: datetime
     notes: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ─── Analytics Schemas ───
@@ -156,8 +158,7 @@ class SupplierCreate(BaseModel):
 
 class SupplierResponse(SupplierCreate):
     id: int
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class PurchaseOrderResponse(BaseModel):
     id: int
@@ -170,5 +171,4 @@ class PurchaseOrderResponse(BaseModel):
     supplier_name: Optional[str] = None
     product_name: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
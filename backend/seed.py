@@ -4,6 +4,7 @@ Generates realistic batch data with varying expiry dates.
 """
 import csv
 import random
+import numpy as np
 from datetime import date, timedelta, datetime
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal, init_db
@@ -65,11 +66,13 @@ SHELF_LIFE = {
     "Health and Hygiene": (180, 730),
 }
 
+SEED = 42
 
-def generate_barcode(item_id: str) -> str:
-    """Generate a 13-digit EAN barcode."""
+
+def generate_barcode(item_id: str, rng: random.Random = random) -> str:
+    """Generate a 13-digit EAN barcode; the check digit comes from `rng`."""
     base = f"890{item_id.replace('ITM', '').zfill(9)}"
-    return base[:12] + str(random.randint(0, 9))
+    return base[:12] + str(rng.randint(0, 9))
 
 
 def seed_database():
@@ -87,98 +90,106 @@ def seed_database():
         csv_path = "medium_sales_dataset.csv"
         with open(csv_path, "r") as f:
             reader = csv.DictReader(f)
-            rows = list(reader)
-
-        products_created = 0
-        used_names = set()
-
-        for row in rows:
-            category = row["Item_Type"]
-            if category not in PRODUCT_NAMES:
-                continue
-
-            # Pick a unique product name
-            available = [n for n in PRODUCT_NAMES[category] if n not in used_names]
-            if not available:
-                continue
-
-            name = available[0]
-            used_names.add(name)
-            item_id = row["Item_ID"]
-
-            product = Product(
-                item_id=item_id,
-                name=name,
-                category=category,
-                fat_content=row.get("Item_Fat_Content", "Regular"),
-                weight=float(row.get("Item_Weight", 0)),
-                mrp=float(row.get("Item_MRP", 0)),
-                barcode=generate_barcode(item_id),
-                min_stock=random.randint(5, 20),
-            )
-            db.add(product)
-            db.flush()
-
-            # Create 2-4 batches per product with varying expiry
-            shelf_min, shelf_max = SHELF_LIFE.get(category, (30, 180))
-            num_batches = random.randint(2, 4)
-
-            for b in range(num_batches):
-                days_offset = random.randint(-10, shelf_max)
-                expiry = date.today() + timedelta(days=days_offset)
-                mfg = expiry - timedelta(days=random.randint(shelf_min, shelf_max))
-                qty = random.randint(0, 50)
-
-                batch = Batch(
-                    product_id=product.id,
-                    batch_number=f"B{item_id}-{b+1:02d}",
-                    quantity=qty,
-                    cost_price=round(float(row["Item_MRP"]) * 0.6, 2),
-                    manufacture_date=mfg,
-                    expiry_date=expiry,
+
+            products_created = 0
+            used_names = set()
+            products, batches, transactions = [], [], []
+            # Fixed seed so every fresh database gets the same sample data; local
+            # generators leave the process-wide random state alone
+            barcode_rng = random.Random(SEED)
+            rng = np.random.default_rng(SEED)
+            today, now = date.today(), datetime.now()
+
+            # Stream rows so reading stops as soon as 65 products exist
+            for row in reader:
+                category = row["Item_Type"]
+                if category not in PRODUCT_NAMES:
+                    continue
+
+                # Pick a unique product name
+                available = [n for n in PRODUCT_NAMES[category] if n not in used_names]
+                if not available:
+                    continue
+
+                name = available[0]
+                used_names.add(name)
+                item_id = row["Item_ID"]
+                mrp = float(row.get("Item_MRP", 0))
+
+                product = Product(
+                    item_id=item_id,
+                    name=name,
+                    category=category,
+                    fat_content=row.get("Item_Fat_Content", "Regular"),
+                    weight=float(row.get("Item_Weight", 0)),
+                    mrp=mrp,
+                    barcode=generate_barcode(item_id, barcode_rng),
+                    min_stock=int(rng.integers(5, 21)),
                 )
-                db.add(batch)
-                db.flush()
-
-                # Generate sample sale transactions
-                num_sales = random.randint(1, 5)
-                for _ in range(num_sales):
-                    sale_qty = random.randint(1, max(1, qty // 3))
-                    sale_date = datetime.now() - timedelta(
-                        days=random.randint(0, 60)
-                    )
-                    tx = Transaction(
-                        product_id=product.id,
-                        batch_id=batch.id,
-                        transaction_type="sale",
-                        quantity=sale_qty,
-                        unit_price=float(row["Item_MRP"]),
-                        total_amount=round(sale_qty * float(row["Item_MRP"]), 2),
-                        transaction_date=sale_date,
+                products.append(product)
+
+                # Create 2-4 batches per product with varying expiry; per-batch values drawn at once
+                shelf_min, shelf_max = SHELF_LIFE.get(category, (30, 180))
+                num_batches = int(rng.integers(2, 5))
+                days_offsets = rng.integers(-10, shelf_max + 1, size=num_batches).tolist()
+                shelf_lives = rng.integers(shelf_min, shelf_max + 1, size=num_batches).tolist()
+                qtys = rng.integers(0, 51, size=num_batches).tolist()
+                sale_counts = rng.integers(1, 6, size=num_batches).tolist()
+                wasted = (rng.random(num_batches) < 0.15).tolist()
+
+                for b in range(num_batches):
+                    expiry = today + timedelta(days=days_offsets[b])
+                    mfg = expiry - timedelta(days=shelf_lives[b])
+                    qty = qtys[b]
+
+                    batch = Batch(
+                        product=product,
+                        batch_number=f"B{item_id}-{b+1:02d}",
+                        quantity=qty,
+                        cost_price=round(mrp * 0.6, 2),
+                        manufacture_date=mfg,
+                        expiry_date=expiry,
                     )
-                    db.add(tx)
-
-                # Occasional wastage
-                if random.random() < 0.15:
-                    waste_qty = random.randint(1, max(1, qty // 5))
-                    tx = Transaction(
-                        product_id=product.id,
-                        batch_id=batch.id,
-                        transaction_type="wastage",
-                        quantity=waste_qty,
-                        unit_price=float(row["Item_MRP"]),
-                        total_amount=round(waste_qty * float(row["Item_MRP"]), 2),
-                        transaction_date=datetime.now() - timedelta(
-                            days=random.randint(0, 30)
-                        ),
-                        notes="Expired / Damaged",
-                    )
-                    db.add(tx)
-
-            products_created += 1
-            if products_created >= 65:
-                break
-
+                    batches.append(batch)
+
+                    # Generate sample sale transactions
+                    sale_qtys = rng.integers(1, max(1, qty // 3) + 1, size=sale_counts[b]).tolist()
+                    sale_days = rng.integers(0, 61, size=sale_counts[b]).tolist()
+                    for sale_qty, days_ago in zip(sale_qtys, sale_days):
+                        tx = Transaction(
+                            product=product,
+                            batch=batch,
+                            transaction_type="sale",
+                            quantity=sale_qty,
+                            unit_price=mrp,
+                            total_amount=round(sale_qty * mrp, 2),
+                            transaction_date=now - timedelta(days=days_ago),
+                        )
+                        transactions.append(tx)
+
+                    # Occasional wastage
+                    if wasted[b]:
+                        waste_qty = int(rng.integers(1, max(1, qty // 5) + 1))
+                        tx = Transaction(
+                            product=product,
+                            batch=batch,
+                            transaction_type="wastage",
+                            quantity=waste_qty,
+                            unit_price=mrp,
+                            total_amount=round(waste_qty * mrp, 2),
+                            transaction_date=now - timedelta(days=int(rng.integers(0, 31))),
+                            notes="Expired / Damaged",
+                        )
+                        transactions.append(tx)
+
+                products_created += 1
+                if products_created >= 65:
+                    break
+
+        # Relationships carry the foreign keys, so one flush inserts each table in bulk
+        db.add_all(products)
+        db.add_all(batches)
+        db.add_all(transactions)
         db.commit()
         print(f"✅ Seeded {products_created} products with batches and transactions.")
     except Exception as e:
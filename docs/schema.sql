@@ -16,10 +16,10 @@ CREATE TABLE products (
     name            VARCHAR(200)  NOT NULL,
     category        VARCHAR(50)   NOT NULL,
     fat_content     VARCHAR(20)   DEFAULT 'Regular',
-    weight          FLOAT         DEFAULT 0.0,
-    mrp             FLOAT         NOT NULL,
+    weight          NUMERIC(8,3)  DEFAULT 0.0,
+    mrp             NUMERIC(10,2) NOT NULL,
     barcode         VARCHAR(50),
-    min_stock       INTEGER       DEFAULT 10,
+    min_stock       SMALLINT      DEFAULT 10,
     image_url       VARCHAR(500),
     created_at      DATETIME      DEFAULT (CURRENT_TIMESTAMP),
     updated_at      DATETIME      DEFAULT (CURRENT_TIMESTAMP),
@@ -30,6 +30,7 @@ CREATE TABLE products (
 CREATE INDEX        ix_products_id      ON products (id);
 CREATE UNIQUE INDEX ix_products_item_id ON products (item_id);
 CREATE UNIQUE INDEX ix_products_barcode ON products (barcode);
+CREATE INDEX        ix_products_category ON products (category);
 
 
 -- ────────────────────────────────────────────────────────────
@@ -43,7 +44,7 @@ CREATE TABLE batches (
     product_id        INTEGER       NOT NULL,
     batch_number      VARCHAR(50)   NOT NULL,
     quantity          INTEGER       NOT NULL  DEFAULT 0,
-    cost_price        FLOAT         DEFAULT 0.0,
+    cost_price        NUMERIC(10,2) DEFAULT 0.0,
     manufacture_date  DATE,
     expiry_date       DATE          NOT NULL,
     received_date     DATETIME      DEFAULT (CURRENT_TIMESTAMP),
@@ -53,6 +54,8 @@ CREATE TABLE batches (
 );
 
 CREATE INDEX ix_batches_id ON batches (id);
+CREATE INDEX ix_batches_expiry_qty ON batches (expiry_date, quantity);
+CREATE INDEX ix_batches_product_expiry ON batches (product_id, expiry_date);
 
 
 -- ────────────────────────────────────────────────────────────
@@ -66,8 +69,8 @@ CREATE TABLE transactions (
     batch_id           INTEGER,
     transaction_type   VARCHAR(20)   NOT NULL,   -- 'sale' | 'wastage' | 'restock'
     quantity           INTEGER       NOT NULL,
-    unit_price         FLOAT         DEFAULT 0.0,
-    total_amount       FLOAT         DEFAULT 0.0,
+    unit_price         NUMERIC(10,2) DEFAULT 0.0,
+    total_amount       NUMERIC(10,2) DEFAULT 0.0,
     transaction_date   DATETIME      DEFAULT (CURRENT_TIMESTAMP),
     notes              TEXT,
 
@@ -77,6 +80,8 @@ CREATE TABLE transactions (
 );
 
 CREATE INDEX ix_transactions_id ON transactions (id);
+CREATE INDEX ix_transactions_product_type_date ON transactions (product_id, transaction_type, transaction_date);
+CREATE INDEX ix_transactions_date ON transactions (transaction_date);
 
 
 -- ────────────────────────────────────────────────────────────
@@ -17,10 +17,10 @@ CREATE TABLE IF NOT EXISTS products (
     name            VARCHAR(200)  NOT NULL,
     category        VARCHAR(50)   NOT NULL,
     fat_content     VARCHAR(20)   DEFAULT 'Regular',
-    weight          DOUBLE PRECISION DEFAULT 0.0,
-    mrp             DOUBLE PRECISION NOT NULL,
+    weight          NUMERIC(8,3)  DEFAULT 0.0,
+    mrp             NUMERIC(10,2) NOT NULL,
     barcode         VARCHAR(50)   UNIQUE,
-    min_stock       INTEGER       DEFAULT 10,
+    min_stock       SMALLINT      DEFAULT 10,
     image_url       VARCHAR(500),
     created_at      TIMESTAMPTZ   DEFAULT NOW(),
     updated_at      TIMESTAMPTZ   DEFAULT NOW()
@@ -30,6 +30,10 @@ CREATE INDEX IF NOT EXISTS ix_products_item_id  ON products (item_id);
 CREATE INDEX IF NOT EXISTS ix_products_barcode  ON products (barcode);
 CREATE INDEX IF NOT EXISTS ix_products_category ON products (category);
 
+-- Trigram index for the name ILIKE '%term%' product search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops);
+
 
 -- ────────────────────────────────────────────────────────────
 -- TABLE: batches
@@ -41,7 +45,7 @@ CREATE TABLE IF NOT EXISTS batches (
     product_id        INTEGER       NOT NULL REFERENCES products(id) ON DELETE CASCADE,
     batch_number      VARCHAR(50)   NOT NULL,
     quantity          INTEGER       NOT NULL DEFAULT 0,
-    cost_price        DOUBLE PRECISION DEFAULT 0.0,
+    cost_price        NUMERIC(10,2) DEFAULT 0.0,
     manufacture_date  DATE,
     expiry_date       DATE          NOT NULL,
     received_date     TIMESTAMPTZ   DEFAULT NOW()
@@ -49,6 +53,8 @@ CREATE TABLE IF NOT EXISTS batches (
 
 CREATE INDEX IF NOT EXISTS ix_batches_product_id  ON batches (product_id);
 CREATE INDEX IF NOT EXISTS ix_batches_expiry_date ON batches (expiry_date);
+CREATE INDEX IF NOT EXISTS ix_batches_expiry_qty   ON batches (expiry_date, quantity);
+CREATE INDEX IF NOT EXISTS ix_batches_product_expiry ON batches (product_id, expiry_date);
 
 
 -- ────────────────────────────────────────────────────────────
@@ -61,8 +67,8 @@ CREATE TABLE IF NOT EXISTS transactions (
     batch_id           INTEGER       REFERENCES batches(id),
     transaction_type   VARCHAR(20)   NOT NULL,
     quantity           INTEGER       NOT NULL,
-    unit_price         DOUBLE PRECISION DEFAULT 0.0,
-    total_amount       DOUBLE PRECISION DEFAULT 0.0,
+    unit_price         NUMERIC(10,2) DEFAULT 0.0,
+    total_amount       NUMERIC(10,2) DEFAULT 0.0,
     transaction_date   TIMESTAMPTZ   DEFAULT NOW(),
     notes              TEXT
 );
@@ -70,6 +76,8 @@ CREATE TABLE IF NOT EXISTS transactions (
 CREATE INDEX IF NOT EXISTS ix_transactions_product_id ON transactions (product_id);
 CREATE INDEX IF NOT EXISTS ix_transactions_type       ON transactions (transaction_type);
 CREATE INDEX IF NOT EXISTS ix_transactions_date       ON transactions (transaction_date);
+CREATE INDEX IF NOT EXISTS ix_transactions_product_type_date
+    ON transactions (product_id, transaction_type, transaction_date);
 
 
 -- ────────────────────────────────────────────────────────────
@@ -11,19 +11,20 @@ with open(app_js_path, 'r') as f:
 # Matches: function name( or async function name(
 # Assumes function names are valid identifiers
 func_pattern = re.compile(r'^(?:async\s+)?function\s+([a-zA-Z0-9_]+)\s*\(', re.MULTILINE)
+# Matches existing exports: window.name =
+EXPORT_RE = re.compile(r'window\.([a-zA-Z0-9_]+)\s*=')
 
-matches = func_pattern.findall(content)
-unique_funcs = sorted(list(set(matches)))
+unique_funcs = set(func_pattern.findall(content))
 
 # Existing exports
-existing_exports = re.findall(r'window\.([a-zA-Z0-9_]+)\s*=', content)
+existing_exports = set(EXPORT_RE.findall(content))
 
 # Check for const/let defined functions if any (unlikely in this codebase but good to check)
 # Skipping for now as code uses function declarations mostly.
 
 to_append = []
-for func in unique_funcs:
-    if func not in existing_exports and func != 'init': # init might be generic, but let's include it
+for func in sorted(unique_funcs - existing_exports):
+    if func != 'init': # init might be generic, but let's include it
         to_append.append(f"window.{func} = {func};")
 
 if to_append:
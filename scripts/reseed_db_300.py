@@ -1,50 +1,41 @@
 
 import sys
 import os
-import random
-from datetime import date, timedelta
-from sqlalchemy import text
+import itertools
+import numpy as np
+from numpy.random import PCG64DXSM, Generator, SeedSequence
+from datetime import date
+from sqlalchemy import insert, text
 
 # Add parent directory to path to import backend modules
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from backend.database import SessionLocal, engine, Base
+from backend.database import engine
 from backend.models import Product, Batch, Supplier, ItemCategory
 
+SEED_ENTROPY = 0xC0FFEE
+
+
 def seed_db():
     print("Seeding database with ~300 items...")
-    db = SessionLocal()
+    # One generator for every draw; a SeedSequence over a wide entropy value fills the
+    # full PCG64DXSM state and makes reseeds reproducible
+    rng = Generator(PCG64DXSM(SeedSequence(entropy=SEED_ENTROPY)))
 
-    # Clear existing data - ensure clean slate
-    try:
-        db.execute(text("DELETE FROM transactions")) # Delete transactions first due to FK
-        db.execute(text("DELETE FROM batches"))      # Delete batches second
-        db.execute(text("DELETE FROM purchase_orders"))
-        db.execute(text("DELETE FROM products"))     # Delete products third
-        db.execute(text("DELETE FROM suppliers"))    # Delete suppliers last
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"Error clearing tables: {e}")
-        return
-
-    # Seed Suppliers (One per category)
+    # Seed Suppliers (One per category); rows are written in the seeding transaction below
     print("Creating suppliers...")
-    suppliers = {}
-    for cat in ItemCategory:
-        supplier = Supplier(
-            name=f"{cat.value} Distributor Inc.",
-            category=cat.value,
-            contact_email=f"sales@{cat.name.lower()}.com",
-            phone=f"555-01{random.randint(10, 99)}"
-        )
-        db.add(supplier)
-        suppliers[cat.value] = supplier
-    db.commit()
+    suppliers_data = [
+        {
+            "name": f"{cat.value} Distributor Inc.",
+            "category": cat.value,
+            "contact_email": f"sales@{cat.name.lower()}.com",
+            "phone": f"555-01{rng.integers(10, 100)}",
+        }
+        for cat in ItemCategory
+    ]
 
     # Generate ~300 Products
     print("Generating products...")
-    products_data = []
 
     # Category specific data templates
     categories = {
@@ -62,109 +53,139 @@ def seed_db():
     brands = ["StoreBrand", "Premium", "Organic", "Value", "BestChoice", "EcoErrors", "ChefSelect", "HomeBasic", "FreshField", "GreenValley", "Golden", "Sunny", "Daily", "Prime"]
     variants = ["Original", "Large", "Small", "Regular", "Family Size", "Mini", "Spicy", "Sweet", "Unsalted", "Low Fat", "Classic", "Extra"]
 
-    count = 1
     total_target = 300
-    
-    # We loop until we hit the target count
-    while count <= total_target:
-        for cat, items in categories.items():
-            if count > total_target: break
-            
-            item_base = random.choice(items)
-            brand = random.choice(brands)
-            variant = random.choice(variants)
-            name = f"{brand} {item_base} {variant}"
-            
-            # Simple check to avoid exact duplicate names in this batch
-            exists = False
-            for p in products_data:
-                if p['name'] == name: 
-                    exists = True
-                    break
-            if exists: continue
-
-            # Pricing logic
-            base_price = random.uniform(25, 550)
-            mrp = round(base_price * random.uniform(1.1, 1.4), 2)
-            
-            products_data.append({
-                "item_id": f"ITM{count:04d}",
-                "name": name,
-                "category": cat.value,
-                "mrp": mrp,
-                "barcode": f"890123{count:04d}",
-                "min_stock": random.randint(5, 20),
-            })
-            count += 1
-
-    # Add items to DB
+    # Final length is known up front: fill slots by index instead of growing by append
+    products_data = [None] * total_target
+    count = 0
+    seen_names: set[str] = set()
+
+    cat_order = list(categories)
+    item_counts = np.array([len(categories[cat]) for cat in cat_order])
+    # Oversample so duplicate-name skips rarely need another round; a whole number
+    # of category cycles lets each round restart the cycle at the first category
+    draws = len(cat_order) * -(-2 * total_target // len(cat_order))
+
+    def candidates():
+        """Endless (category, name, mrp, min_stock) stream, cycling categories round-robin."""
+        while True:
+            # All name parts and prices for one round in a handful of vectorised draws
+            item_idx = rng.integers(0, np.resize(item_counts, draws))
+            brand_idx = rng.integers(0, len(brands), draws)
+            variant_idx = rng.integers(0, len(variants), draws)
+            base_prices = rng.uniform(25, 550, draws)
+            markups = rng.uniform(1.1, 1.4, draws)
+            min_stocks = rng.integers(5, 21, draws)
+            for cat, i, b, v, base_price, markup, min_stock in zip(
+                itertools.cycle(cat_order), item_idx.tolist(), brand_idx.tolist(),
+                variant_idx.tolist(), base_prices.tolist(), markups.tolist(), min_stocks.tolist(),
+            ):
+                # Pricing logic
+                yield cat, f"{brands[b]} {categories[cat][i]} {variants[v]}", round(base_price * markup, 2), min_stock
+
+    # A single straight-line pass until we hit the target count
+    for cat, name, mrp, min_stock in candidates():
+        if count == total_target: break
+
+        # Simple check to avoid exact duplicate names in this batch
+        if name in seen_names: continue
+        seen_names.add(name)
+
+        count += 1
+        products_data[count - 1] = {
+            "item_id": f"ITM{count:04d}",
+            "name": name,
+            "category": cat.value,
+            "mrp": mrp,
+            "barcode": f"890123{count:04d}",
+            "min_stock": min_stock,
+        }
+
+    sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as conn:
+        conn = conn.execution_options(insertmanyvalues_page_size=500)
+        if sqlite:
+            # Throwaway seed data: skip fsync and keep the rollback journal and temp
+            # tables in memory while the bulk load runs on this connection
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.exec_driver_sql("PRAGMA journal_mode=MEMORY")
+            conn.exec_driver_sql("PRAGMA temp_store=MEMORY")
+            conn.commit()  # close the autobegun transaction so begin() below starts fresh
+        try:
+            # Clearing and every insert share one transaction: a single commit at the
+            # end, and a failure anywhere leaves the previous data untouched
+            with conn.begin():
+                n_batches = _load(conn, rng, suppliers_data, products_data)
+        finally:
+            if sqlite:
+                # Back to the settings backend.database applies on connect, since the
+                # pool hands this connection out again
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+                conn.exec_driver_sql("PRAGMA synchronous=NORMAL")
+    print(f"Database seeded successfully with {len(products_data)} items and {n_batches} batches!")
+
+
+def _load(conn, rng, suppliers_data, products_data):
+    """Clear the store tables and bulk-insert suppliers, products and batches; returns the batch count."""
+    # Clear existing data - ensure clean slate
+    conn.execute(text("DELETE FROM transactions")) # Delete transactions first due to FK
+    conn.execute(text("DELETE FROM batches"))      # Delete batches second
+    conn.execute(text("DELETE FROM purchase_orders"))
+    conn.execute(text("DELETE FROM products"))     # Delete products third
+    conn.execute(text("DELETE FROM suppliers"))    # Delete suppliers last
+
+    conn.execute(insert(Supplier.__table__), suppliers_data)
+
+    # Products and batches go in through Core executemany
     print(f"Adding {len(products_data)} products to database...")
-    db_products = []
-    for p_data in products_data:
-        prod = Product(
-            item_id=p_data["item_id"],
-            name=p_data["name"],
-            category=p_data["category"],
-            mrp=p_data["mrp"],
-            barcode=p_data["barcode"],
-            min_stock=p_data["min_stock"]
-        )
-        db.add(prod)
-        db_products.append(prod)
-    db.commit()
-    
-    # Refresh to get IDs
-    for p in db_products:
-        db.refresh(p)
-
-    # Seed Batches for each product
+    # RETURNING hands back each generated id with the insert itself (no refresh or re-SELECT)
+    id_map = dict(conn.execute(
+        insert(Product.__table__).returning(Product.item_id, Product.id), products_data
+    ).all())
+
+    # Seed Batches for each product: every per-batch field comes from one NumPy draw
     print("Creating batches...")
-    batch_count = 0
-    for prod in db_products:
-        # 1-3 batches per product
-        num_batches = random.choices([1, 2, 3], weights=[0.5, 0.3, 0.2])[0]
-        
-        for i in range(num_batches):
-            # Expiry logic: 
-            # 5% Expired (-30 to -1 days)
-            # 10% Critical (1 to 7 days)
-            # 15% Warning (8 to 15 days)
-            # 70% Fresh (16 to 365 days)
-            rand_val = random.random()
-            today = date.today()
-            
-            if rand_val < 0.05:
-                # Expired
-                expiry = today - timedelta(days=random.randint(1, 45))
-            elif rand_val < 0.15:
-                # Critical
-                expiry = today + timedelta(days=random.randint(1, 7))
-            elif rand_val < 0.30:
-                # Warning
-                expiry = today + timedelta(days=random.randint(8, 15))
-            else:
-                # Fresh
-                expiry = today + timedelta(days=random.randint(16, 400))
-
-            # Cost price logic (margin)
-            cost_price = round(prod.mrp * random.uniform(0.6, 0.85), 2)
-            
-            qty = random.randint(10, 100)
-            
-            batch = Batch(
-                product_id=prod.id,
-                batch_number=f"BATCH-{prod.item_id}-{i+1}",
-                quantity=qty,
-                cost_price=cost_price,
-                expiry_date=expiry,
-                manufacture_date=expiry - timedelta(days=180)
-            )
-            db.add(batch)
-            batch_count += 1
-    
-    db.commit()
-    print(f"Database seeded successfully with {len(db_products)} items and {batch_count} batches!")
-    db.close()
+    # 1-3 batches per product
+    num_batches = rng.choice([1, 2, 3], size=len(products_data), p=[0.5, 0.3, 0.2])
+    n_total = int(num_batches.sum())
+    owners = np.repeat(np.arange(len(products_data)), num_batches)
+    # 1-based batch number within each product
+    seq = np.arange(n_total) - np.repeat(np.cumsum(num_batches) - num_batches, num_batches) + 1
+
+    # Expiry logic:
+    # 5% Expired (-45 to -1 days)
+    # 10% Critical (1 to 7 days)
+    # 15% Warning (8 to 15 days)
+    # 70% Fresh (16 to 400 days)
+    rand_vals = rng.random(n_total)
+    offsets = np.select(
+        [rand_vals < 0.05, rand_vals < 0.15, rand_vals < 0.30],
+        [-rng.integers(1, 46, n_total), rng.integers(1, 8, n_total), rng.integers(8, 16, n_total)],
+        rng.integers(16, 401, n_total),
+    )
+    qtys = rng.integers(10, 101, n_total)
+    # Cost price logic (margin)
+    margins = rng.uniform(0.6, 0.85, n_total)
+
+    # Date arithmetic as datetime64[D] arrays; .tolist() yields datetime.date objects
+    expiry64 = np.datetime64(date.today(), "D") + offsets.astype("timedelta64[D]")
+    manufactured64 = expiry64 - np.timedelta64(180, "D")
+    batch_mappings = [
+        {
+            "product_id": id_map[products_data[p]["item_id"]],
+            "batch_number": f"BATCH-{products_data[p]['item_id']}-{i}",
+            "quantity": qty,
+            "cost_price": round(products_data[p]["mrp"] * margin, 2),
+            "expiry_date": expiry,
+            "manufacture_date": manufactured,
+        }
+        for p, i, qty, margin, expiry, manufactured in zip(
+            owners.tolist(), seq.tolist(), qtys.tolist(), margins.tolist(),
+            expiry64.tolist(), manufactured64.tolist(),
+        )
+    ]
+
+    conn.execute(insert(Batch.__table__), batch_mappings)
+    return len(batch_mappings)
 
 if __name__ == "__main__":
     seed_db()
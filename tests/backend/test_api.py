@@ -29,6 +29,18 @@ def test_create_product_api(client):
     assert res_data["name"] == "API Test Product"
     assert res_data["id"] is not None
 
+def test_create_product_column_bounds(client):
+    """A 1 kg item fits the weight column; values past the column limits are a 422."""
+    data = {"item_id": "API002", "name": "Rice 1kg", "category": "Staples", "mrp": 80.0, "weight": 1000.0}
+    res = client.post("/api/products", json=data)
+    assert res.status_code == 200
+    assert res.json()["weight"] == 1000.0
+
+    assert client.post("/api/products", json={**data, "item_id": "API003", "weight": 100000.0}).status_code == 422
+    assert client.post("/api/products", json={**data, "item_id": "API004", "min_stock": 40000}).status_code == 422
+    product_id = res.json()["id"]
+    assert client.put(f"/api/products/{product_id}", json={"min_stock": -1}).status_code == 422
+
 def test_create_duplicate_product_api(client, sample_product):
     """Duplicate item_id should fail."""
     data = {
@@ -135,6 +147,19 @@ def test_transaction_insufficient_stock(client, sample_product):
     assert "Insufficient stock" in res.json()["detail"]
 
 
+def test_transaction_sale_fifo_across_batches(client, sample_product_with_batches):
+    """A sale drains batches oldest-expiry first; an oversized sale changes nothing."""
+    product, _ = sample_product_with_batches
+    sale = {"product_id": product.id, "transaction_type": "sale", "unit_price": 45.0}
+
+    assert client.post("/api/transactions", json={**sale, "quantity": 25}).status_code == 200
+    qty = {b["batch_number"]: b["quantity"] for b in client.get(f"/api/products/{product.id}").json()["batches"]}
+    assert qty == {"B-TEST001-01": 50, "B-TEST001-02": 5, "B-TEST001-03": 0}
+
+    assert client.post("/api/transactions", json={**sale, "quantity": 100}).status_code == 400
+    assert client.get(f"/api/products/{product.id}").json()["total_stock"] == 55
+
+
 # ─── Analytics & Reports ───
 
 def test_dashboard_stats(client, sample_product_with_batches):
@@ -196,3 +221,270 @@ def test_supplier_flow(client):
     
     list_res = client.get("/api/suppliers")
     assert len(list_res.json()) >= 1
+
+def test_dashboard_kpi_values(client, sample_product_with_batches, multiple_products):
+    """KPI aggregates: stock value, batch count and low-stock products."""
+    data = client.get("/api/dashboard/kpi").json()
+
+    assert data["total_products"] == 5
+    assert data["total_batches"] == 3
+    # 50*30 + 20*32 + 10*28
+    assert data["total_stock_value"] == 2420.0
+    # sample product has 80 units (min 10); the four others have no stock
+    assert data["low_stock_count"] == 4
+
+    dash = client.get("/api/dashboard").json()
+    assert dash["total_stock_value"] == 2420.0
+    assert sorted(a["item_id"] for a in dash["stock_alerts"]) == ["MP001", "MP002", "MP003", "MP004"]
+    # Counts come from the same SQL totals as the KPI endpoint
+    for key in ("total_batches", "expiring_soon", "low_stock_count"):
+        assert dash[key] == data[key]
+
+
+def test_product_list_includes_batches(client, sample_product_with_batches):
+    """Batches are eager-loaded for the list and category endpoints."""
+    products = client.get("/api/products").json()
+    assert len(products[0]["batches"]) == 3
+    assert products[0]["total_stock"] == 80
+
+    cats = client.get("/api/analytics/categories")
+    assert cats.status_code == 200
+
+
+def test_product_list_low_stock_filter(client, sample_product_with_batches, multiple_products):
+    """low_stock=true returns only products below min_stock, filtered in SQL."""
+    products = client.get("/api/products", params={"low_stock": True}).json()
+    assert sorted(p["item_id"] for p in products) == ["MP001", "MP002", "MP003", "MP004"]
+    assert all(p["total_stock"] < p["min_stock"] for p in products)
+
+
+def test_product_batches_use_one_today(client, sample_product_with_batches, monkeypatch):
+    """Product endpoints derive batch status/days from one date, not the per-batch properties."""
+    from backend.models import Batch
+    product, _ = sample_product_with_batches
+
+    def fail(self):
+        raise AssertionError("per-batch property should not be read when serializing products")
+
+    monkeypatch.setattr(Batch, "expiry_status", property(fail))
+    monkeypatch.setattr(Batch, "days_until_expiry", property(fail))
+
+    expected = [("fresh", 60), ("warning", 10), ("expired", -5)]
+    for url in (f"/api/products/{product.id}", f"/api/products/barcode/{product.barcode}"):
+        batches = sorted(client.get(url).json()["batches"], key=lambda b: -b["days_until_expiry"])
+        assert [(b["expiry_status"], b["days_until_expiry"]) for b in batches] == expected
+    listed = client.get("/api/products").json()[0]["batches"]
+    assert len(listed) == 3 and {b["expiry_status"] for b in listed} == {"fresh", "warning", "expired"}
+
+
+def test_expiry_status_boundaries(client, db, sample_product):
+    """SQL-computed status buckets match the 0 / <7 / <=15 day thresholds."""
+    from backend.models import Batch
+    for offset in (0, 1, 6, 7, 15, 16):
+        db.add(Batch(
+            product_id=sample_product.id,
+            batch_number=f"EDGE-{offset}",
+            quantity=1,
+            expiry_date=date.today() + timedelta(days=offset),
+        ))
+    db.commit()
+
+    alerts = client.get("/api/batches/expiring?days=30").json()
+    assert [(a["days_left"], a["status"]) for a in alerts] == [
+        (0, "expired"), (1, "critical"), (6, "critical"),
+        (7, "warning"), (15, "warning"), (16, "good"),
+    ]
+
+    cron = client.get("/api/cron/daily-check").json()
+    assert cron["total_batches_checked"] == 6
+    assert cron["alerts_generated"] == 5
+
+
+def test_dashboard_kpi_cached_until_write(client, db, sample_product):
+    """KPIs are served from cache until an API write invalidates them."""
+    from backend.models import Product
+    assert client.get("/api/dashboard/kpi").json()["total_products"] == 1
+
+    # A write behind the API's back is not seen while the entry is fresh
+    db.add(Product(item_id="SIDE001", name="Side Door", category="Dairy", mrp=5.0))
+    db.commit()
+    assert client.get("/api/dashboard/kpi").json()["total_products"] == 1
+
+    client.post("/api/batches", json={
+        "product_id": sample_product.id,
+        "quantity": 5,
+        "cost_price": 2.0,
+        "expiry_date": str(date.today() + timedelta(days=30)),
+    })
+    kpi = client.get("/api/dashboard/kpi").json()
+    assert kpi["total_products"] == 2
+    assert kpi["total_batches"] == 1
+
+
+def test_revenue_analytics_daily_totals(client, db, sample_product):
+    """Sales and wastage are summed per calendar day in one row."""
+    from datetime import datetime
+    from backend.models import Transaction
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    yesterday = now - timedelta(days=1)
+    db.add_all([
+        Transaction(product_id=sample_product.id, transaction_type="sale", quantity=1,
+                    unit_price=10.0, total_amount=10.0, transaction_date=yesterday),
+        Transaction(product_id=sample_product.id, transaction_type="sale", quantity=2,
+                    unit_price=10.0, total_amount=20.0, transaction_date=now),
+        Transaction(product_id=sample_product.id, transaction_type="wastage", quantity=1,
+                    unit_price=5.0, total_amount=5.0, transaction_date=now),
+        Transaction(product_id=sample_product.id, transaction_type="restock", quantity=9,
+                    unit_price=1.0, total_amount=9.0, transaction_date=now),
+    ])
+    db.commit()
+
+    data = client.get("/api/analytics/revenue?days=7").json()
+    assert data == [
+        {"date": str(yesterday.date()), "revenue": 10.0, "wastage": 0.0, "net": 10.0},
+        {"date": str(now.date()), "revenue": 20.0, "wastage": 5.0, "net": 15.0},
+    ]
+
+
+def test_product_search(client, multiple_products):
+    """Search matches a substring of name, item_id or barcode."""
+    names = [p["item_id"] for p in client.get("/api/products", params={"search": "mp00"}).json()]
+    assert sorted(names) == ["MP001", "MP002", "MP003", "MP004"]
+
+
+def test_purchase_orders_include_names(client, db, seed_basic):
+    """PO drafts expose the supplier and product names."""
+    from backend.models import PurchaseOrder
+    db.add(PurchaseOrder(supplier_id=seed_basic.supplier.id, product_id=seed_basic.product.id, quantity=25))
+    db.commit()
+
+    pos = client.get("/api/purchase-orders").json()
+    assert len(pos) == 1
+    assert pos[0]["supplier_name"] == seed_basic.supplier.name
+    assert pos[0]["product_name"] == seed_basic.product.name
+    assert pos[0]["quantity"] == 25
+
+
+def test_seasonal_predictions_api(client, multiple_products):
+    """Seasonal endpoint returns one row per category and month."""
+    rows = client.get("/api/ml/seasonal").json()
+    assert len(rows) == 4 * 12
+    assert {r["month"] for r in rows} == set(range(1, 13))
+
+    rows = client.get("/api/ml/seasonal", params={"category": "Dairy", "month": 3}).json()
+    assert len(rows) == 1
+    assert rows[0]["month_name"] == "March"
+
+
+def test_ml_trained_before_client_serves(client, analyzer):
+    """Under test, CSV training completes during startup rather than racing requests."""
+    assert analyzer.is_trained
+    assert "Dairy" in analyzer.models
+
+
+def test_expiring_batches_days_validation(client, sample_product_with_batches):
+    """days defaults to 365 and is bounded to 0..3650."""
+    alerts = client.get("/api/batches/expiring").json()
+    assert len(alerts) == 3
+    assert all("product_id" in a for a in alerts)
+
+    assert client.get("/api/batches/expiring?days=-1").status_code == 422
+    assert client.get("/api/batches/expiring?days=4000").status_code == 422
+
+
+def test_expiring_batches_keyset_pagination(client, sample_product_with_batches):
+    """Pages follow X-Next-Cursor until every batch has been returned once."""
+    first = client.get("/api/batches/expiring", params={"limit": 2})
+    assert [a["batch_number"] for a in first.json()] == ["B-TEST001-03", "B-TEST001-02"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = client.get("/api/batches/expiring", params={"limit": 2, "cursor": cursor})
+    assert [a["batch_number"] for a in second.json()] == ["B-TEST001-01"]
+    assert "X-Next-Cursor" not in second.headers
+
+    assert client.get("/api/batches/expiring", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_categories_cached_until_product_write(client, db, sample_product):
+    """Categories are cached and refreshed when a product is created."""
+    from backend.models import Product
+    assert client.get("/api/categories").json() == ["Dairy"]
+
+    db.add(Product(item_id="SIDE002", name="Side Door", category="Canned", mrp=5.0))
+    db.commit()
+    assert client.get("/api/categories").json() == ["Dairy"]
+
+    client.post("/api/products", json={"item_id": "NEW001", "name": "Soap", "category": "Household", "mrp": 20.0})
+    assert sorted(client.get("/api/categories").json()) == ["Canned", "Dairy", "Household"]
+
+
+def test_sale_drafts_po_when_stockout_imminent(client, db, sample_product, sample_supplier):
+    """A sale that leaves < 2 days of stock drafts a PO after the response."""
+    client.post("/api/batches", json={
+        "product_id": sample_product.id,
+        "quantity": 100,
+        "cost_price": 20.0,
+        "expiry_date": str(date.today() + timedelta(days=60)),
+    })
+    res = client.post("/api/transactions", json={
+        "product_id": sample_product.id, "transaction_type": "sale", "quantity": 95, "unit_price": 45.0,
+    })
+    assert res.status_code == 200
+
+    pos = client.get("/api/purchase-orders").json()
+    assert len(pos) == 1
+    assert pos[0]["product_id"] == sample_product.id
+    assert pos[0]["supplier_name"] == sample_supplier.name
+
+
+def test_stockout_check_caches_avg_sales(client, sample_product, sample_supplier):
+    """Only the first sale of a product runs the 30-day aggregate; later sales advance the cache."""
+    from backend import main
+    client.post("/api/batches", json={
+        "product_id": sample_product.id,
+        "quantity": 100,
+        "cost_price": 20.0,
+        "expiry_date": str(date.today() + timedelta(days=60)),
+    })
+    sale = {"product_id": sample_product.id, "transaction_type": "sale", "unit_price": 45.0}
+    client.post("/api/transactions", json={**sale, "quantity": 30})
+    assert main._avg_sales_cache[sample_product.id] == 1.0
+
+    client.post("/api/transactions", json={**sale, "quantity": 65})
+    assert main._avg_sales_cache[sample_product.id] == 1.0 + 65 / 30.0
+    # 5 units left at ~3.2/day: a PO is drafted and remembered as open
+    assert sample_product.id in main._open_po_cache
+    assert len(client.get("/api/purchase-orders").json()) == 1
+
+
+def test_pulse_discount_window(client, db, sample_product):
+    """Only in-stock batches expiring in 1..6 days trigger the pulse discount."""
+    from backend.models import Batch
+    for offset, qty in ((0, 5), (1, 5), (6, 5), (7, 5), (3, 0)):
+        db.add(Batch(
+            product_id=sample_product.id,
+            batch_number=f"PULSE-{offset}-{qty}",
+            quantity=qty,
+            expiry_date=date.today() + timedelta(days=offset),
+        ))
+    db.commit()
+
+    data = client.get(f"/api/products/{sample_product.id}/pulse").json()
+    assert data["has_discount"] is True
+    assert data["discount_pct"] == 20
+    assert [b["days_left"] for b in data["near_expiry_batches"]] == [1, 6]
+
+
+def test_dashboard_matches_schema(client, sample_product_with_batches, multiple_products):
+    """The hand-assembled dashboard payload still validates as DashboardStats."""
+    from backend.schemas import DashboardStats
+    product, _ = sample_product_with_batches
+    client.post("/api/transactions", json={
+        "product_id": product.id, "transaction_type": "sale", "quantity": 2, "unit_price": 50.0,
+    })
+
+    stats = DashboardStats.model_validate(client.get("/api/dashboard").json())
+    assert stats.total_batches == 3
+    assert stats.recent_transactions[0].total_amount == 100.0
+    assert stats.category_sales[0].total_quantity == 2
+    assert {a.item_id for a in stats.stock_alerts} == {"MP001", "MP002", "MP003", "MP004"}
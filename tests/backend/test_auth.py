@@ -0,0 +1,182 @@
+"""
+Unit tests for the authentication module.
+Tests token round-trips and the decoded-token / current-user caches.
+"""
+import ast
+import bcrypt
+from datetime import timedelta
+from backend import auth
+from backend.auth import create_access_token, decode_token
+from backend.models import User
+
+
+def test_decode_token_roundtrip():
+    """A freshly issued token decodes back to its claims."""
+    token = create_access_token({"sub": "alice", "role": "staff"})
+    payload = decode_token(token)
+
+    assert payload["sub"] == "alice"
+    assert payload["role"] == "staff"
+
+
+def test_decode_token_invalid():
+    """Garbage tokens decode to None and are not cached."""
+    size_before = len(auth._token_cache)
+    assert decode_token("not-a-jwt") is None
+    assert len(auth._token_cache) == size_before
+
+
+def test_decode_token_served_from_cache(monkeypatch):
+    """A second decode of the same token skips jwt.decode."""
+    token = create_access_token({"sub": "bob"})
+    decode_token(token)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("jwt.decode should not be called on a cache hit")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail)
+    assert decode_token(token)["sub"] == "bob"
+
+
+def test_decode_token_expired_not_served_from_cache():
+    """A cached payload is ignored once the token itself has expired."""
+    token = create_access_token({"sub": "carol"}, expires_delta=timedelta(seconds=-1))
+    key = auth.hashlib.sha256(token.encode()).hexdigest()[:32]
+    auth._token_cache[key] = {"sub": "carol", "exp": 0}
+
+    assert decode_token(token) is None
+
+
+def test_current_user_cached_until_invalidated(client, db):
+    """/api/auth/me serves the cached user until the cache entry is dropped."""
+    user = User(username="dave", hashed_password="x", full_name="Dave", role="staff")
+    db.add(user)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'dave'})}"}
+    auth.invalidate_user_cache("dave")
+
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Dave"
+
+    user.full_name = "David"
+    db.commit()
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Dave"
+
+    auth.invalidate_user_cache("dave")
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "David"
+
+
+def test_login_upgrades_legacy_bcrypt_hash(client, db):
+    """Logging in with a bcrypt-hashed password rehashes it with argon2."""
+    legacy = bcrypt.hashpw(b"s3cret", bcrypt.gensalt(rounds=4)).decode()
+    user = User(username="erin", hashed_password=legacy, full_name="Erin", role="staff")
+    db.add(user)
+    db.commit()
+
+    res = client.post("/api/auth/login", json={"username": "erin", "password": "s3cret"})
+    assert res.status_code == 200
+
+    db.refresh(user)
+    assert user.hashed_password.startswith("$argon2")
+    assert auth.verify_password("s3cret", user.hashed_password)
+
+
+def test_secure_compare():
+    assert auth.secure_compare("admin", "admin")
+    assert not auth.secure_compare("admin", "staff")
+    assert not auth.secure_compare("", "admin")
+
+
+def test_auth_module_has_no_plain_string_equality():
+    """auth.py must use secure_compare rather than ==/!= against str/bytes literals."""
+    tree = ast.parse(open(auth.__file__).read())
+    offenders = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Compare):
+            continue
+        if not any(isinstance(op, (ast.Eq, ast.NotEq)) for op in node.ops):
+            continue
+        operands = [node.left, *node.comparators]
+        if any(isinstance(o, ast.Constant) and isinstance(o.value, (str, bytes)) for o in operands):
+            offenders.append(node.lineno)
+    assert offenders == [], f"plain string comparison on line(s) {offenders}"
+
+
+def test_seed_default_users_idempotent(db, monkeypatch):
+    """Seeding twice creates each default user exactly once."""
+    monkeypatch.setattr(auth, "_seeded", False)
+    auth.seed_default_users(db)
+    monkeypatch.setattr(auth, "_seeded", False)
+    auth.seed_default_users(db)
+
+    usernames = sorted(u for (u,) in db.query(User.username))
+    assert usernames == ["admin", "staff"]
+
+
+def test_seed_default_users_passwords(db, monkeypatch):
+    """Default users get the pre-computed hashes unless a password is set via env."""
+    monkeypatch.setattr(auth, "_seeded", False)
+    monkeypatch.setenv("STAFF_PASSWORD", "override-pw")
+    auth.seed_default_users(db)
+
+    admin = db.query(User).filter(User.username == "admin").one()
+    staff = db.query(User).filter(User.username == "staff").one()
+    assert admin.hashed_password == auth.ADMIN_DEFAULT_HASH
+    assert auth.verify_password("admin123", admin.hashed_password)
+    assert auth.verify_password("override-pw", staff.hashed_password)
+
+
+def test_seed_default_users_skips_when_seeded(db, monkeypatch):
+    """Once seeded, later calls in the same process don't touch the database."""
+    monkeypatch.setattr(auth, "_seeded", False)
+    auth.seed_default_users(db)
+    assert auth._seeded is True
+
+    db.query(User).delete()
+    db.commit()
+    auth.seed_default_users(db)
+    assert db.query(User).count() == 0
+
+
+def test_verify_password_rejects_wrong_and_malformed():
+    hashed = auth.hash_password("right")
+    assert auth.verify_password("right", hashed)
+    assert not auth.verify_password("wrong", hashed)
+    assert not auth.verify_password("right", "not-a-hash")
+
+
+def test_current_user_uid_must_match_subject(client, db):
+    """A token whose uid points at a different user is rejected."""
+    db.add_all([
+        User(username="frank", hashed_password="x", full_name="Frank", role="staff"),
+        User(username="grace", hashed_password="x", full_name="Grace", role="admin"),
+    ])
+    db.commit()
+    grace = db.query(User).filter(User.username == "grace").one()
+    auth.invalidate_user_cache("frank")
+
+    token = create_access_token({"sub": "frank", "uid": grace.id})
+    res = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert res.status_code == 401
+
+
+def test_current_user_cache_hit_checks_uid(client, db):
+    """A cached user is not served for a token whose uid belongs to another account."""
+    old = User(username="heidi", hashed_password="x", full_name="Heidi", role="staff")
+    db.add(old)
+    db.commit()
+    old_uid = old.id
+    stale = create_access_token({"sub": "heidi", "uid": old_uid})
+
+    # Username re-used by a new account (explicit id: SQLite would reuse the old rowid)
+    db.delete(old)
+    db.commit()
+    db.add(User(id=old_uid + 100, username="heidi", hashed_password="x", full_name="Heidi II", role="staff"))
+    db.commit()
+    auth.invalidate_user_cache("heidi")
+
+    fresh = create_access_token({"sub": "heidi", "uid": old_uid + 100})
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {fresh}"}).status_code == 200
+
+    # The new account is now cached under "heidi"; the old uid must not ride on it
+    res = client.get("/api/auth/me", headers={"Authorization": f"Bearer {stale}"})
+    assert res.status_code == 401
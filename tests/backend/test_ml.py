@@ -1,25 +1,46 @@
 """
 Integration and Unit tests for the ML Seasonal Engine.
 """
-from backend.ml_engine import seasonal_analyzer
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from types import SimpleNamespace
+from backend.ml_engine import SeasonalAnalyzer, _fit_quadratic
+from backend.models import ItemCategory
 
-def test_ml_prediction_sanity():
+
+def sales_frame(sales):
+    """Sales DataFrame from {category: [(month, quantity), ...]}; amount is 10 per unit."""
+    rows = [(cat, month, qty) for cat, points in sales.items() for month, qty in points]
+    df = pd.DataFrame(rows, columns=["category", "month", "quantity"])
+    df["amount"] = df["quantity"] * 10.0
+    return df
+
+
+def trained_analyzer(sales):
+    """A fresh SeasonalAnalyzer trained on `sales` (see sales_frame)."""
+    analyzer = SeasonalAnalyzer()
+    analyzer._train_from_sales(sales_frame(sales))
+    return analyzer
+
+
+def test_ml_prediction_sanity(analyzer):
     """ML Engine should return sensible predictions format."""
-    pred = seasonal_analyzer.predict_demand("Dairy", 5)
+    pred = analyzer.predict_demand("Dairy", 5)
     
     assert "predicted_demand" in pred
     assert pred["month"] == 5
     assert pred["category"] == "Dairy"
     assert pred["predicted_demand"] >= 0
 
-def test_ml_heuristic_fallback():
+def test_ml_heuristic_fallback(analyzer):
     """Unknown categories should use heuristics (confidence 0.5)."""
-    pred = seasonal_analyzer.predict_demand("UnknownCategory", 1)
+    pred = analyzer.predict_demand("UnknownCategory", 1)
     
     assert pred["confidence"] == 0.5
     assert pred["predicted_demand"] > 0
 
-def test_ml_insights_format():
+def test_ml_insights_format(analyzer):
     """Insights should return list of dict components."""
     # Ensure analyzer has at least some data (heuristic)
     dummy_data = {
@@ -29,13 +50,108 @@ def test_ml_insights_format():
         }
     }
     # We won't mock internals, just call public API which handles empty state
-    insights = seasonal_analyzer.get_category_insights()
+    insights = analyzer.get_category_insights()
     
     # Even if empty, it should be a list
     assert isinstance(insights, list)
 
-def test_ml_training_does_not_crash():
+def test_ml_training_does_not_crash(analyzer):
     """Training with empty list should be safe."""
-    seasonal_analyzer.train_from_transactions([])
+    analyzer.train_from_transactions([])
     # If we reached here, no exception was raised
     assert True
+
+def test_ml_predictions_cached_per_training_run():
+    """Trained-category predictions are memoized and dropped on retrain."""
+    analyzer = trained_analyzer({"Dairy": [(1, 10), (2, 20), (3, 30)]})
+    first = analyzer.predict_demand("Dairy", 2)
+    assert analyzer.predict_demand("Dairy", 2) is first
+
+    analyzer._train_from_sales(sales_frame({"Dairy": [(1, 5), (2, 5), (3, 5)]}))
+    assert analyzer.predict_demand("Dairy", 2) is not first
+
+def test_ml_predict_demand_batch_matches_scalar():
+    """Batched predictions agree with one-at-a-time predict_demand."""
+    analyzer = trained_analyzer({"Dairy": [(1, 10), (4, 40), (8, 25), (12, 5)]})
+    cats = ["Dairy", "Soft Drinks"]
+    months = np.arange(1, 13)
+    demand = analyzer.predict_demand_batch(cats, months)
+
+    assert demand.shape == (2, 12)
+    for i, cat in enumerate(cats):
+        for j, m in enumerate(months):
+            assert demand[i, j] == analyzer.predict_demand(cat, int(m))["predicted_demand"]
+
+def test_ml_insights_cached_until_retrain():
+    """Insights and the all-predictions list are computed once per training run."""
+    sales = {"Dairy": [(1, 10), (6, 30), (12, 10)]}
+    analyzer = trained_analyzer(sales)
+    insights = analyzer.get_category_insights()
+    predictions = analyzer.get_all_predictions()
+    assert analyzer.get_category_insights() is insights
+    assert analyzer.get_all_predictions() is predictions
+    assert len(predictions) == 12 * len(analyzer._known_categories)
+
+    analyzer._train_from_sales(sales_frame(sales))
+    assert analyzer.get_category_insights() is not insights
+    assert analyzer.get_all_predictions() is not predictions
+
+def test_ml_insights_match_per_month_predictions():
+    """Vectorized insights agree with 12 scalar predict_demand calls."""
+    analyzer = trained_analyzer({
+        "Dairy": [(1, 10), (4, 40), (8, 25), (12, 5)],
+        "Soft Drinks": [(3, 60), (6, 90), (9, 30)],
+    })
+    for insight in analyzer.get_category_insights():
+        monthly = [analyzer.predict_demand(insight["category"], m)["predicted_demand"] for m in range(1, 13)]
+        assert insight["peak_demand"] == round(max(monthly), 2)
+        assert insight["low_demand"] == round(min(monthly), 2)
+        assert insight["mean_demand"] == round(float(np.mean(monthly)), 2)
+        assert insight["volatility"] == round(float(np.std(monthly)), 2)
+
+def test_ml_fit_quadratic_recovers_coefficients():
+    """The NumPy least-squares fit recovers an exact quadratic."""
+    months = np.arange(1, 13)
+    coef = _fit_quadratic(months, 5 + 3 * months - 0.25 * months ** 2)
+    assert np.allclose(coef, [5, 3, -0.25])
+
+def test_ml_train_from_transactions_accumulates_by_month():
+    """Transactions are summed per (category, month) and fitted without pandas."""
+    def txn(category, month, quantity):
+        product = SimpleNamespace(category=category) if category else None
+        return SimpleNamespace(product=product, transaction_date=datetime(2024, month, 1), quantity=quantity)
+
+    analyzer = SeasonalAnalyzer()
+    analyzer.train_from_transactions([
+        txn("Dairy", 1, 4), txn("Dairy", 1, 6), txn("Dairy", 5, 20), txn("Dairy", 9, 8),
+        txn(None, 2, 3), txn(None, 2, 1),
+    ])
+
+    dairy = analyzer.models["Dairy"]
+    assert np.allclose(dairy["coef"], _fit_quadratic([1, 5, 9], [10, 20, 8]))
+    assert dairy["data_points"] == 4
+    assert dairy["mean_sales"] == 9.5
+    assert np.isclose(dairy["std_sales"], np.std([4, 6, 20, 8], ddof=1))
+    # A single month of sales is not enough to fit a trend
+    assert "Unknown" not in analyzer.models
+
+def test_ml_heuristic_prediction_memoized():
+    """Heuristic fallbacks are computed once per (category, month)."""
+    SeasonalAnalyzer._get_heuristic_prediction.cache_clear()
+    first = SeasonalAnalyzer().predict_demand("Cold Drinks", 5)["predicted_demand"]
+    assert first == 90.0
+    assert SeasonalAnalyzer().predict_demand("Cold Drinks", 5)["predicted_demand"] == first
+    assert SeasonalAnalyzer._get_heuristic_prediction.cache_info().hits == 1
+
+def test_ml_all_predictions_cover_untrained_categories():
+    """Catalog categories without a model still get 12 heuristic predictions."""
+    analyzer = trained_analyzer({
+        "Dairy": [(1, 10), (6, 30), (12, 10)],
+        "Stationery": [(3, 7), (4, 9)],
+    })
+    predictions = analyzer.get_all_predictions()
+
+    categories = {p["category"] for p in predictions}
+    assert categories == {c.value for c in ItemCategory} | {"Stationery"}
+    for pred in predictions:
+        assert pred == analyzer.predict_demand(pred["category"], pred["month"])
@@ -51,6 +51,11 @@ class TestProductModel:
         # 50 + 20 + 10 = 80
         assert product.total_stock == 80
 
+    def test_seed_basic_links_batches(self, db, seed_basic):
+        """The single-commit composite fixture wires batches to their product."""
+        assert [b.product_id for b in seed_basic.batches] == [seed_basic.product.id] * 3
+        assert seed_basic.product.total_stock == 80
+
     def test_total_stock_excludes_zero_quantity(self, db):
         """Batches with 0 quantity are excluded from total_stock."""
         product = Product(item_id="UNIT003", name="Zero Qty", category="Dairy", mrp=10.0)
@@ -174,6 +179,15 @@ class TestBatchModel:
         db.commit()
         assert batch.days_until_expiry == -10
 
+    def test_status_for_uses_given_today(self):
+        """status_for/days_for evaluate against the supplied date, not date.today()."""
+        today = date(2024, 1, 1)
+        expiry = date(2024, 1, 8)
+        assert Batch.days_for(expiry, today) == 7
+        assert Batch.status_for(expiry, today) == "critical"
+        assert Batch.status_for(expiry, today - timedelta(days=30)) == "fresh"
+        assert Batch.status_for(expiry, expiry) == "expired"
+
 
 class TestTransactionModel:
     """Tests for the Transaction ORM model."""
@@ -252,11 +266,11 @@ class TestSupplierModel:
 class TestPurchaseOrderModel:
     """Tests for the PurchaseOrder ORM model."""
 
-    def test_create_purchase_order(self, db, sample_product, sample_supplier):
+    def test_create_purchase_order(self, db, seed_basic):
         """Purchase order can be created and linked to supplier + product."""
         po = PurchaseOrder(
-            supplier_id=sample_supplier.id,
-            product_id=sample_product.id,
+            supplier_id=seed_basic.supplier.id,
+            product_id=seed_basic.product.id,
             quantity=100,
             status="draft",
             predicted_stockout_date=date.today() + timedelta(days=2),
@@ -4,24 +4,53 @@ Uses an in-memory SQLite database so tests never touch production data.
 """
 import os
 import sys
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from datetime import date, timedelta
+from types import SimpleNamespace
 
 # Ensure project root is on the path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.database import Base, get_db
-from backend.main import app
-from backend.models import Product, Batch, Transaction, Supplier, PurchaseOrder
+# The app's own engine (used by lifespan seeding) must not be shared between
+# xdist workers or point at a real database: give each worker its own scratch file.
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(
+    tempfile.gettempdir(), f"campus_store_test_{os.getenv('PYTEST_XDIST_WORKER', 'main')}.db"
+)
+# Finish CSV training during app startup, so prediction tests never race the training task
+os.environ["ML_BACKGROUND_TRAINING"] = "0"
+
+# backend.main (FastAPI app, ML engine, schemas) is imported inside the fixtures that
+# need it, so collection and -k filtering only pay for the ORM layer.
+from backend.database import Base, get_db, engine as app_engine
+from backend.models import Product, Batch, Supplier
 
 
 # ─── In-memory test DB ───
-TEST_DATABASE_URL = "sqlite:///./test_campus_store.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# StaticPool hands every session the same connection, so they all see one in-memory database
+TEST_DATABASE_URL = "sqlite://"
+engine = create_engine(
+    TEST_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+# Sessions join the per-test outer transaction; their commits only release a SAVEPOINT
+TestingSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine, join_transaction_mode="create_savepoint"
+)
+
+
+# pysqlite's own transaction handling breaks SAVEPOINT; let SQLAlchemy emit BEGIN itself
+@event.listens_for(engine, "connect")
+def _disable_pysqlite_begin(dbapi_conn, _connection_record):
+    dbapi_conn.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
 
 
 def override_get_db():
@@ -33,12 +62,35 @@ def override_get_db():
         db.close()
 
 
-@pytest.fixture(scope="function", autouse=True)
+@pytest.fixture(scope="session")
 def setup_database():
-    """Create all tables before each test, drop after."""
+    """Create all tables once per test session, drop at the end."""
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    # Close pooled connections (test and app engines) instead of leaving them to GC
+    engine.dispose()
+    app_engine.dispose()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def connection(setup_database):
+    """Run each test inside an outer transaction that is rolled back on teardown."""
+    from backend.main import (
+        invalidate_categories_cache, invalidate_dashboard_cache, invalidate_stockout_caches,
+    )
+    conn = engine.connect()
+    outer = conn.begin()
+    TestingSessionLocal.configure(bind=conn)
+    invalidate_dashboard_cache()
+    invalidate_categories_cache()
+    invalidate_stockout_caches()
+    try:
+        yield conn
+    finally:
+        outer.rollback()
+        conn.close()
+        TestingSessionLocal.configure(bind=engine)
 
 
 @pytest.fixture
@@ -51,59 +103,67 @@ def db():
         session.close()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
-    """FastAPI TestClient wired to the test database."""
+    """FastAPI TestClient wired to the test database.
+
+    One client (and one app startup) for the whole session; the per-test
+    `connection` rollback keeps tests isolated.
+    """
+    from backend.main import app
     app.dependency_overrides[get_db] = override_get_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
 
 
-# ─── Data Factory Helpers ───
+@pytest.fixture(scope="session")
+def analyzer():
+    """The app's global SeasonalAnalyzer, imported once per test session (per xdist worker)."""
+    from backend.ml_engine import seasonal_analyzer
+    return seasonal_analyzer
 
-@pytest.fixture
-def sample_product(db):
-    """Insert and return a single sample product."""
-    product = Product(
-        item_id="TEST001",
-        name="Test Milk 500ml",
-        category="Dairy",
-        fat_content="Low Fat",
-        weight=500.0,
-        mrp=45.0,
-        barcode="9900000000001",
-        min_stock=10,
-    )
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
 
+# ─── Data Factory Helpers ───
 
-@pytest.fixture
-def sample_product_with_batches(db, sample_product):
-    """Insert a product with multiple batches (fresh, warning, expired)."""
+SAMPLE_PRODUCT = dict(
+    item_id="TEST001",
+    name="Test Milk 500ml",
+    category="Dairy",
+    fat_content="Low Fat",
+    weight=500.0,
+    mrp=45.0,
+    barcode="9900000000001",
+    min_stock=10,
+)
+
+SAMPLE_SUPPLIER = dict(
+    name="Test Dairy Supplier",
+    category="Dairy",
+    contact_email="dairy@test.com",
+    phone="9876543210",
+)
+
+
+def sample_batch_rows():
+    """Column values for three batches of the sample product (fresh, warning, expired)."""
     today = date.today()
-    batches = [
-        Batch(
-            product_id=sample_product.id,
+    return [
+        dict(
             batch_number="B-TEST001-01",
             quantity=50,
             cost_price=30.0,
             manufacture_date=today - timedelta(days=30),
             expiry_date=today + timedelta(days=60),  # Fresh
         ),
-        Batch(
-            product_id=sample_product.id,
+        dict(
             batch_number="B-TEST001-02",
             quantity=20,
             cost_price=32.0,
             manufacture_date=today - timedelta(days=90),
             expiry_date=today + timedelta(days=10),  # Warning (≤15 days)
         ),
-        Batch(
-            product_id=sample_product.id,
+        dict(
             batch_number="B-TEST001-03",
             quantity=10,
             cost_price=28.0,
@@ -111,28 +171,67 @@ def sample_product_with_batches(db, sample_product):
             expiry_date=today - timedelta(days=5),  # Expired
         ),
     ]
-    db.add_all(batches)
+
+
+def commit_keeping_state(db):
+    """Commit without expiring the session's objects, so fixtures need no refresh SELECT.
+
+    The flush fills in the PKs and the attributes set in Python stay loaded. Columns
+    with a server_default (``created_at`` and the like) were never fetched, so they
+    still load on first access.
+    """
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = True
+
+
+@pytest.fixture
+def sample_product(db):
+    """Insert and return a single sample product."""
+    product = Product(**SAMPLE_PRODUCT)
+    db.add(product)
+    commit_keeping_state(db)
+    return product
+
+
+@pytest.fixture
+def sample_product_with_batches(db, sample_product):
+    """Insert a product with multiple batches (fresh, warning, expired)."""
+    rows = [dict(row, product_id=sample_product.id) for row in sample_batch_rows()]
+    # One INSERT ... RETURNING yields loaded Batch objects, in input order (SQLite >= 3.35)
+    batches = db.scalars(
+        insert(Batch).returning(Batch, sort_by_parameter_order=True), rows
+    ).all()
     db.commit()
-    for b in batches:
-        db.refresh(b)
     return sample_product, batches
 
 
 @pytest.fixture
 def sample_supplier(db):
     """Insert and return a sample supplier."""
-    supplier = Supplier(
-        name="Test Dairy Supplier",
-        category="Dairy",
-        contact_email="dairy@test.com",
-        phone="9876543210",
-    )
+    supplier = Supplier(**SAMPLE_SUPPLIER)
     db.add(supplier)
-    db.commit()
-    db.refresh(supplier)
+    commit_keeping_state(db)
     return supplier
 
 
+@pytest.fixture
+def seed_basic(db):
+    """Sample product, its three batches and a supplier, written with a single commit.
+
+    Use instead of stacking ``sample_product`` / ``sample_product_with_batches`` /
+    ``sample_supplier``, which commit once each.
+    """
+    product = Product(**SAMPLE_PRODUCT)
+    batches = [Batch(product=product, **row) for row in sample_batch_rows()]
+    supplier = Supplier(**SAMPLE_SUPPLIER)
+    with db.begin():
+        db.add_all([product, supplier, *batches])
+    return SimpleNamespace(product=product, supplier=supplier, batches=batches)
+
+
 @pytest.fixture
 def multiple_products(db):
     """Insert multiple products across categories for analytics tests."""
@@ -143,7 +242,5 @@ def multiple_products(db):
         Product(item_id="MP004", name="Shampoo 200ml", category="Health and Hygiene", mrp=120.0, barcode="1100000000004", min_stock=5),
     ]
     db.add_all(products)
-    db.commit()
-    for p in products:
-        db.refresh(p)
+    commit_keeping_state(db)
     return products